@@ -0,0 +1,60 @@
+'''
+Microbenchmark for decoding atomic arrays.
+
+Compares the element by element loop _get_values used before with
+unpack_array for a REAL[10000] reply, for each of the array formats.
+
+python benchmarks/bench_array_decode.py
+'''
+import os
+import sys
+import timeit
+
+from struct import pack, unpack_from
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pylogix import eip
+
+
+def loop_decode(fmt, data, data_size):
+    values = []
+    num_bytes = len(data) - data_size
+    counter = 0
+    while True:
+        index = 2 + (counter * data_size)
+        if index > num_bytes:
+            break
+        values.append(unpack_from(fmt, data, index)[0])
+        counter += 1
+    return values
+
+
+def best(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+
+def main():
+    count = 10000
+    data = pack('<H', 0xca) + pack('<{}f'.format(count), *[i * 0.5 for i in range(count)])
+    assert loop_decode('<f', data, 4) == eip.unpack_array('<f', data, 2, count)
+
+    formats = ['list', 'array']
+    try:
+        import numpy
+        formats.append('numpy')
+    except ImportError:
+        pass
+
+    number = 50
+    results = [('element loop', best(lambda: loop_decode('<f', data, 4), number))]
+    for array_format in formats:
+        results.append((array_format, best(lambda: eip.unpack_array('<f', data, 2, count, array_format), number)))
+
+    print('REAL[{}]'.format(count))
+    for name, seconds in results:
+        print('{:<16}{:10.1f} us'.format(name, seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+'''
+Microbenchmark for tag name parsing.
+
+Compares the regex based parse_tag_name/bit_of_word pylogix used before
+with the tokenizer (parse_tag_path) for a 2000 tag scan, both for a
+single call and for the calls a multi-tag read makes for every tag.
+
+python benchmarks/bench_tag_parse.py
+'''
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pylogix import eip
+
+
+def regex_parse_tag_name(tag):
+    bit_end_pattern = r'\.\d+$'
+    array_pattern = r'\[\s*(0|[1-9][0-9]*)(\s*,\s*(0|[1-9][0-9]*))*\s*\]$'
+
+    try:
+        index = re.search(array_pattern, tag).group(0)
+        index = index[1:-1]
+        if ',' in index:
+            index = index.split(',')
+            index = list(map(int, index))
+        else:
+            index = int(index)
+    except Exception:
+        index = 0
+
+    base_tag = re.sub(bit_end_pattern, '', tag)
+    base_tag = re.sub(array_pattern, '', base_tag)
+
+    return tag, base_tag, index
+
+
+def regex_bit_of_word(tag):
+    s = tag.split('.')
+    if s[len(s) - 1].isdigit():
+        return True
+    else:
+        return False
+
+
+def make_tags(count):
+    forms = ['Dint{}', 'Program:MainProgram.Real{}', 'Udt{}.Member.Value', 'Array[{}]',
+             'Udt[{}].Items[3].Value', 'Word{}.7', 'Grid[{},2]', 'Line{}.Motor.Running']
+    return [forms[i % len(forms)].format(i) for i in range(count)]
+
+
+def scan_regex(tags):
+    # what a multi-tag read did per tag: parse_tag_name in
+    # _get_unknown_types, _generate_read_service_list, _build_ioi,
+    # _parse_multi_read_response and bit_of_word twice
+    for tag in tags:
+        regex_parse_tag_name(tag)
+        regex_parse_tag_name(tag)
+        regex_parse_tag_name(tag)
+        regex_parse_tag_name(tag)
+        regex_bit_of_word(tag)
+        regex_bit_of_word(tag)
+
+
+def scan_tokenizer(tags):
+    for tag in tags:
+        eip.parse_tag_name(tag)
+        eip.parse_tag_name(tag)
+        eip.parse_tag_name(tag)
+        eip.parse_tag_name(tag)
+        eip.bit_of_word(tag)
+        eip.bit_of_word(tag)
+
+
+def cold_tokenizer(tags):
+    for tag in tags:
+        eip.TagPath(tag)
+
+
+def best(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+
+def main():
+    tags = make_tags(2000)
+    for tag in tags:
+        assert regex_parse_tag_name(tag) == eip.parse_tag_name(tag), tag
+
+    number = 20
+    results = [('regex parse_tag_name', best(lambda: [regex_parse_tag_name(t) for t in tags], number)),
+               ('tokenizer, first parse', best(lambda: cold_tokenizer(tags), number)),
+               ('tokenizer, parsed before', best(lambda: [eip.parse_tag_name(t) for t in tags], number)),
+               ('regex, per scan', best(lambda: scan_regex(tags), number)),
+               ('tokenizer, per scan', best(lambda: scan_tokenizer(tags), number))]
+
+    print('{} tags'.format(len(tags)))
+    for name, seconds in results:
+        print('{:<28}{:8.3f} ms'.format(name, seconds * 1000))
+    print('scan speedup {:.1f}x'.format(results[3][1] / results[4][1]))
+
+
+if __name__ == '__main__':
+    main()
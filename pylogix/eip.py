@@ -18,16 +18,22 @@
 """
 
 import math
-import re
+import sys
 import time
 
+from .lgx_bits import BitArray, bits_to_int, bytes_to_bits, bytes_to_int, join_bits
 from .lgx_comm import Connection
 from .lgx_device import Device
+from .lgx_plan import PackingReport, ReadPlan
 from .lgx_response import Response
-from .lgx_tag import Tag, UDT
+from .lgx_struct import StructDecoder
+from .lgx_subscribe import Subscription
+from .lgx_tag import Tag, TagHandle, UDT
 from .utils import is_micropython
+from array import array
+from binascii import hexlify
 from random import randrange
-from struct import pack, unpack_from
+from struct import calcsize, pack, unpack_from
 
 
 if not is_micropython():
@@ -37,7 +43,12 @@ if not is_micropython():
 class PLC(object):
     __slots__ = ('IPAddress', 'Port', 'ProcessorSlot', 'SocketTimeout', 'Micro800', 'Route', 'conn', 'Offset', 'UDT',
                  'UDTByName', 'KnownTags', 'TagList', 'ProgramNames', 'StringID', 'StringEncoding', 'CIPTypes', "callback",
-                 'element_count', 'msg_values', 'msg_bytes')
+                 'element_count', 'msg_values', 'msg_bytes', 'RequestWindow', 'TagCache', 'ArrayFormat',
+                 'BoolFormat', 'Packing', 'StructFormat', 'struct_decoders', 'CoalesceReads',
+                 'SymbolInstanceAddressing', 'symbol_instances')
+
+    # class of the connection each instance talks over
+    connection_class = Connection
 
     def __init__(self, ip_address="", slot=0, timeout=5.0, Micro800=False, port=44818):
         """
@@ -49,8 +60,10 @@ class PLC(object):
         self.SocketTimeout = timeout
         self.Micro800 = Micro800
         self.Route = None
+        self.RequestWindow = 1
+        self.TagCache = None
 
-        self.conn = Connection(self)
+        self.conn = self.connection_class(self)
         self.callback = None
         self.element_count = 0
         self.msg_values = []
@@ -63,6 +76,14 @@ class PLC(object):
         self.ProgramNames = []
         self.StringID = 0x0fce
         self.StringEncoding = 'utf-8'
+        self.ArrayFormat = 'list'
+        self.BoolFormat = 'list'
+        self.Packing = None
+        self.StructFormat = 'bytes'
+        self.struct_decoders = {}
+        self.CoalesceReads = False
+        self.SymbolInstanceAddressing = False
+        self.symbol_instances = (None, {})
         self.CIPTypes = {0x00: (1, "UNKNOWN", '<B'),
                          0xa0: (88, "STRUCT", '<B'),
                          0xc0: (8, "DT", '<Q'),
@@ -106,30 +127,48 @@ class PLC(object):
         """
         Clean up on exit
         """
-        self.conn.close()
+        self.Close()
 
-    def Read(self, tag, count=1, datatype=None):
+    def Read(self, tag, count=1, datatype=None, as_buffer=False):
         """
         We have two options for reading depending on
         the arguments, read a single tag, or read an array
 
+        With as_buffer=True, atomic values are returned in a typed
+        array.array (even a single value), and BOOL arrays and bits
+        of words in a BitArray, instead of a list.  For a list of
+        tags this applies to the arrays in it.
+
+        Structures are returned as bytes, unless StructFormat is 'dict'
+        or 'record' and the UDT is known (GetTagList has been called),
+        then they're decoded into a dict, or a namedtuple, of the
+        members.
+
+        With CoalesceReads set to True, the members of a structure and
+        the elements of an array next to each other in a list of tags
+        are read with one read of the structure or of the range, when
+        that costs less.
+
         returns Response class (.TagName, .Value, .Status)
         """
+        if isinstance(tag, TagHandle):
+            return self._read_handle(tag, as_buffer)
         if isinstance(tag, (list, tuple)):
+            tag = [handle_args(t) for t in tag]
             if len(tag) == 1:
                 if isinstance(tag[0], (list, tuple)):
-                    return [self._read_tag(*tag[0])]
+                    return [self._read_tag(*tag[0], as_buffer=as_buffer)]
                 else:
-                    return [self._read_tag(tag[0], count, datatype)]
+                    return [self._read_tag(tag[0], count, datatype, as_buffer)]
             if self.Micro800:
                 if isinstance(tag[0], (list, tuple)):
-                    return [self._read_tag(*t) for t in tag]
+                    return [self._read_tag(*t, as_buffer=as_buffer) for t in tag]
                 else:
-                    return [self._read_tag(t, count, datatype) for t in tag]
+                    return [self._read_tag(t, count, datatype, as_buffer) for t in tag]
             else:
-                return self._batch_read(tag)
+                return self._batch_read(tag, as_buffer)
         else:
-            return self._read_tag(tag, count, datatype)
+            return self._read_tag(tag, count, datatype, as_buffer)
 
     def Write(self, tag, value=None, datatype=None):
         """
@@ -139,6 +178,7 @@ class PLC(object):
         returns Response class (.TagName, .Value, .Status)
         """
         if isinstance(tag, (list, tuple)):
+            tag = [handle_write_args(t) for t in tag]
             if len(tag) == 1:
                 return [self._write_tag(*tag[0])]
             else:
@@ -146,9 +186,62 @@ class PLC(object):
         else:
             if value is None:
                 raise TypeError('You must provide a value to write')
+            elif isinstance(tag, TagHandle):
+                return self._write_handle(tag, value)
             else:
                 return self._write_tag(tag, value, datatype)
 
+    def Tag(self, tag, count=1, datatype=None):
+        """
+        Get a handle for a tag that is read or written often.  The handle
+        can be passed to Read and Write in place of the tag name, the
+        request is only built once, the first time it is used.
+
+            motor_speed = comm.Tag('MotorSpeed')
+            while True:
+                ret = comm.Read(motor_speed)
+
+        returns TagHandle
+        """
+        tag, base_tag, index = parse_tag_name(tag)
+        return TagHandle(tag, base_tag, count, datatype)
+
+    def CompileReadPlan(self, tags):
+        """
+        Prepare a list of tags that is read over and over.  The tags can
+        be given in any of the forms Read accepts for a list of tags.
+
+        The plan's requests are built the first time it is executed, after
+        that plan.execute() only sends them and unpacks the replies.
+
+            plan = comm.CompileReadPlan(['Tag1', 'Tag2', 'Tag3'])
+            while True:
+                ret = plan.execute()
+
+        returns ReadPlan
+        """
+        tags = self._format_read_tags([handle_args(t) for t in tags])
+        return ReadPlan(self, tags)
+
+    def Subscribe(self, tags, period=1.0, deadband=0, callback=None):
+        """
+        Poll a list of tags and report only the values that changed.  A
+        tag can be given as (tag, deadband), a number is an absolute
+        deadband, a string ending with % a percentage of the last value
+        reported.  Numbers that move less than their deadband aren't
+        reported.
+
+            sub = comm.Subscribe(['Tag1', ('Speed', 0.5), ('Level', '2%')], period=0.5)
+            for change in sub.changes():
+                print(change.TagName, change.Value)
+
+        sub.poll() reads the tags once and returns the changes, sub.run()
+        polls until sub.stop() passing each change to callback.
+
+        returns Subscription
+        """
+        return Subscription(self, tags, period, deadband, callback)
+
     def GetPLCTime(self, raw=False):
         """
         Get the controller clock time, return as human-readable (default) or raw if raw=True
@@ -200,14 +293,27 @@ class PLC(object):
         If is set to False, it will return only controller
         otherwise controller tags and program tags.
 
+        The pages of the program tag lists are requested for every
+        program at once, with up to RequestWindow requests in flight.
+        RequestWindow is 1 by default, which gets them one at a time.
+
         returns Response class (.TagName, .Value, .Status)
         """
+        if self.TagCache is not None:
+            # the cache is loaded when the connection is opened
+            conn = self.conn.connect()
+            if conn[0] and self.TagCache.get_tag_list(allTags) is not None:
+                self.TagList = self.TagCache.get_tag_list(allTags)
+                return Response(None, self.TagList, 0)
+
         self.UDT = {}
         self.KnownTags = {}
         self.TagList = []
         self.ProgramNames = []
         tag_list = self._get_tag_list(allTags)
         updated_list = self._get_udt(tag_list.Value) if tag_list.Value else None
+        if self.TagCache is not None and updated_list is not None:
+            self.TagCache.set_tag_list(allTags, updated_list)
         return Response(None, updated_list, tag_list.Status)
 
     def GetProgramTagList(self, programName):
@@ -311,9 +417,62 @@ class PLC(object):
         """
         Close the connection to the PLC
         """
+        if self.TagCache is not None:
+            self.TagCache.save(self)
         return self.conn.close()
 
-    def _read_tag(self, tag_name, elements=1, data_type=None):
+    def _run(self, requests):
+        """
+        Drive a request generator over the connection.
+
+        Operations that talk to the PLC are written as generators that
+        yield each request and are sent back the (status, ret_data) reply,
+        which lets the asyncio client (lgx_async) share the same logic.
+        The value the generator returns is the result of the operation.
+
+        A generator can also yield a list of requests that don't depend
+        on each other.  They are pipelined, with up to RequestWindow of
+        them in flight, and the generator is sent the list of replies.
+        Unconnected requests are yielded as (request, False, slot).
+        """
+        try:
+            request = next(requests)
+            while True:
+                if isinstance(request, list):
+                    reply = self.conn.send_many(request, self.RequestWindow)
+                elif isinstance(request, tuple):
+                    reply = self.conn.send(*request)
+                else:
+                    reply = self.conn.send(request)
+                request = requests.send(reply)
+        except StopIteration as e:
+            return e.value
+
+    def _tag_cache_requests(self):
+        """
+        Request generator that identifies the controller when a session
+        is opened, and loads the tag cache for it.
+
+        The serial number comes from the identity object.  The controller
+        object (0xAC) attributes 1, 2, 3, 4 and 10 change whenever tags or
+        types are added, removed or edited, so they are used as the
+        fingerprint of the project.
+        """
+        request = self._cip_message(0x01, 0x01, 0x01)
+        status, ret_data = yield request
+        if status != 0:
+            return
+        serial = unpack_from('<I', ret_data, 60)[0]
+
+        request = self._cip_message(0x03, 0xac, 0x01, [1, 2, 3, 4, 10])
+        status, ret_data = yield request
+        if status != 0:
+            return
+        fingerprint = hexlify(ret_data[50:]).decode('ascii')
+
+        self.TagCache.load(self, serial, fingerprint)
+
+    def _read_tag(self, tag_name, elements=1, data_type=None, as_buffer=False):
         """
         Processes the read request
         """
@@ -321,8 +480,14 @@ class PLC(object):
         if not conn[0]:
             return Response(tag_name, None, conn[1])
 
+        return self._run(self._read_tag_requests(tag_name, elements, data_type, as_buffer))
+
+    def _read_tag_requests(self, tag_name, elements=1, data_type=None, as_buffer=False):
+        """
+        Request generator for _read_tag
+        """
         tag, base_tag, index = parse_tag_name(tag_name)
-        resp = self._initial_read(tag, base_tag, data_type)
+        resp = yield from self._initial_read_requests(tag, base_tag, data_type)
         if resp[2] != 0 and resp[2] != 6:
             return Response(tag_name, None, resp[2])
 
@@ -375,27 +540,43 @@ class PLC(object):
             else:
                 pad = 2
 
-            status, ret_data = self.conn.send(request)
+            status, ret_data = yield request
             if not ret_data:
                 return Response(tag_name, None, status)
-            data = ret_data[50:]
+            data = memoryview(ret_data)[50:]
             self.Offset += len(data) - pad
-            req = data
+            req = [data]
+
+            if status == 6 and self.RequestWindow > 1:
+                # atomic types have a known size, so all the remaining
+                # fragments can be requested at once
+                reply_type = unpack_from('<B', ret_data, 50)[0]
+                if reply_type != 0xa0 and reply_type in self.CIPTypes:
+                    if data_type == 0xd3 or bit_of_word(tag):
+                        total = words * self.CIPTypes[reply_type][0]
+                    else:
+                        total = count * self.CIPTypes[reply_type][0]
+                    partial_count = words if data_type == 0xd3 else count
+                    status, data = yield from self._fragmented_read_requests(ioi, partial_count, total, pad)
+                    req.extend(data)
 
             while status == 6:
                 if data_type == 0xd3:
                     request = self._add_partial_read_service(ioi, words)
                 else:
                     request = self._add_partial_read_service(ioi, count)
-                status, ret_data = self.conn.send(request)
-                data = ret_data[50 + pad:]
+                status, ret_data = yield request
+                data = memoryview(ret_data)[50 + pad:]
                 self.Offset += len(data)
-                req += data
+                req.append(data)
 
-            return_values.extend(self._parse_reply(tag_name, count, req))
+            return_values.append(self._parse_reply(tag_name, count, b''.join(req), as_buffer))
 
+        return_values = join_arrays(return_values)
         if return_values:
-            if len(return_values) == 1:
+            if as_buffer and not isinstance(return_values, list):
+                value = return_values
+            elif len(return_values) == 1:
                 value = return_values[0]
             else:
                 value = return_values
@@ -404,7 +585,93 @@ class PLC(object):
 
         return Response(tag_name, value, status)
 
-    def _batch_read(self, tags):
+    def _fragmented_read_requests(self, ioi, elements, total, pad):
+        """
+        Request generator for the rest of a fragmented read, with the
+        fragments pipelined.  The controller fills each reply, so the
+        size of the first fragment (self.Offset) gives the offset of
+        all the others.
+
+        If a reply comes back shorter than expected, the status is left
+        at 6 and self.Offset where the data ends, so the caller can carry
+        on one fragment at a time.
+
+        returns the status and a list of the fragments that were read
+        """
+        chunk = self.Offset
+        # a first reply without data gives no fragment size to go by
+        if chunk <= 0:
+            return 6, []
+        offsets = list(range(self.Offset, total, chunk))
+        if not offsets:
+            return 6, []
+
+        requests = []
+        for offset in offsets:
+            self.Offset = offset
+            requests.append(self._add_partial_read_service(ioi, elements))
+        replies = yield requests
+
+        data = []
+        for offset, (status, ret_data) in zip(offsets, replies):
+            self.Offset = offset
+            if not ret_data:
+                return status, data
+            fragment = memoryview(ret_data)[50 + pad:]
+            if status == 6:
+                expected = min(chunk, total - offset)
+                fragment = fragment[:expected]
+                self.Offset += len(fragment)
+                data.append(fragment)
+                if len(fragment) < expected:
+                    return 6, data
+            else:
+                self.Offset += len(fragment)
+                data.append(fragment)
+                return status, data
+
+        return 6, data
+
+    def _read_handle(self, handle, as_buffer=False):
+        """
+        Processes the read request for a TagHandle
+        """
+        conn = self.conn.connect()
+        if not conn[0]:
+            return Response(handle.TagName, None, conn[1])
+
+        return self._run(self._read_handle_requests(handle, as_buffer))
+
+    def _read_handle_requests(self, handle, as_buffer=False):
+        """
+        Request generator for _read_handle.  Atomic tags send the
+        prebuilt request and unpack the reply directly, anything else
+        (strings, structs, bits, BOOL arrays, fragmented replies) is
+        read like a tag name would be.
+        """
+        if handle.IOI is None:
+            resp = yield from self._resolve_handle_requests(handle)
+            if resp[2] != 0 and resp[2] != 6:
+                return Response(handle.TagName, None, resp[2])
+
+        if handle.read_request is None or as_buffer:
+            response = yield from self._read_tag_requests(handle.TagName, handle.Count, handle.DataType, as_buffer)
+            return response
+
+        status, ret_data = yield handle.read_request
+        if status == 0:
+            values = unpack_from(handle.read_format, ret_data, 52)
+            if handle.Count == 1:
+                return Response(handle.TagName, values[0], status)
+            return Response(handle.TagName, list(values), status)
+        elif status == 6:
+            # more data than fits in a reply, start over with partial reads
+            response = yield from self._read_tag_requests(handle.TagName, handle.Count, handle.DataType)
+            return response
+
+        return Response(handle.TagName, None, status)
+
+    def _batch_read(self, tags, as_buffer=False):
         """
         Read tags using multi-service messaging
         """
@@ -415,7 +682,206 @@ class PLC(object):
         if not conn[0]:
             return [Response(t, None, conn[1]) for t in tags]
 
-        # format requests [tag, length, type]
+        return self._run(self._batch_read_requests(tags, as_buffer))
+
+    def _batch_read_requests(self, tags, as_buffer=False):
+        """
+        Request generator for _batch_read
+        """
+        tags = self._format_read_tags(tags)
+
+        # get data types of unknown tags, reading them gives the values
+        # of the tags that are the base tag
+        discovered = yield from self._get_unknown_types_requests(tags)
+
+        responses = [None] * len(tags)
+        remaining = []
+        for i, tag in enumerate(tags):
+            if tag[0] in discovered and tag[1] == 1 and tag[2] is None:
+                responses[i] = Response(tag[0], discovered[tag[0]], 0)
+            else:
+                remaining.append(i)
+
+        # members of the same structure and elements of an array next
+        # to each other are read together when that costs less
+        if self.CoalesceReads:
+            reads, picks, parents = self._coalesce_reads([tags[i] for i in remaining])
+        else:
+            reads = [tags[i] for i in remaining]
+            picks = [(i, None) for i in range(len(reads))]
+            parents = {}
+
+        # send the read requests.  Arrays whose reply fits in a packet
+        # are read with the multi message service too, larger ones (and
+        # arrays of unknown type) are read on their own
+        read_responses = [None] * len(reads)
+        current_requests = []
+        positions = []
+        singles = []
+        for i, tag in enumerate(reads):
+            if tag[1] > 1 and not self._fits_multi_read(tag):
+                singles.append(i)
+            else:
+                current_requests.append(tag)
+                positions.append(i)
+
+        if current_requests:
+            replies = yield from self._multi_read_requests(current_requests, as_buffer)
+            for i, (tag, value, status) in zip(positions, replies):
+                read_responses[i] = Response(tag, value, status)
+
+        for i in singles:
+            read_responses[i] = yield from self._read_tag_requests(*reads[i], as_buffer=as_buffer)
+
+        # take the values out of the combined reads, the tags of a
+        # combined read that failed are read on their own
+        failed = []
+        for i, (read, pick) in zip(remaining, picks):
+            response = read_responses[read]
+            if pick is None:
+                responses[i] = response
+            elif response.Status != 'Success' or response.Value is None:
+                failed.append(i)
+            else:
+                responses[i] = Response(tags[i][0], self._pick_value(response.Value, pick), 0)
+
+        # the structures that couldn't be read aren't known after all
+        for read, base_tag in parents.items():
+            if read_responses[read].Status != 'Success':
+                self.KnownTags.pop(base_tag, None)
+
+        if failed:
+            replies = yield from self._multi_read_requests([tags[i] for i in failed], as_buffer)
+            for i, (tag, value, status) in zip(failed, replies):
+                responses[i] = Response(tag, value, status)
+
+        return responses
+
+    def _coalesce_reads(self, tags):
+        """
+        Plan the reads of a list of [tag, count, type].  Members of the
+        same structure are read with a read of the structure, and
+        elements of an array next to each other with a read of the
+        range, when that costs fewer bytes than reading them one by one
+        (only the UDTs GetTagList has read are known).
+
+        returns the reads to make, and for each tag the index of the
+        read it's taken from and what to take out of the value: None
+        for the whole value, ('member', name, StructDecoder) or
+        ('element', position).  Also returns the structures added to
+        KnownTags to read them, by the index of their read.
+        """
+        reads = []
+        picks = [None] * len(tags)
+        parents = {}
+        members = {}
+        elements = {}
+        for i, tag in enumerate(tags):
+            if tag[1] == 1 and tag[2] is None:
+                path = parse_tag_path(tag[0])
+                name, index = path.Segments[-1]
+                program = path.Segments[0][0].startswith('Program:')
+                if path.Bit is None and index is None and len(path.Segments) > 1 + program:
+                    members.setdefault(tag[0][:-len(name) - 1], []).append((i, name))
+                    continue
+                data_type = self.KnownTags.get(path.BaseTag, (None, 0))[0]
+                if path.Bit is None and isinstance(index, int) and self._atomic_format(tag[0], data_type):
+                    elements.setdefault(path.BaseTag, []).append((index, i))
+                    continue
+            picks[i] = (len(reads), None)
+            reads.append(tag)
+
+        limit = self.ConnectionSize - 24
+        for parent, group in members.items():
+            decoder = self._struct_decoder(parent, 'dict') if len(group) > 1 else None
+            if decoder is not None and all(name.lower() in decoder.Scalars for i, name in group):
+                # the reply to the structure read, against the request
+                # and reply of each member read
+                parent_cost = len(self._add_read_service(self._build_ioi(parent, 0xa0), 1)) + 2 + 8 + decoder.Size + 2
+                member_cost = 0
+                for i, name in group:
+                    data_type, data_len = self.KnownTags.get(parse_tag_name(tags[i][0])[1], (None, 88))
+                    member_cost += len(self._add_read_service(self._build_ioi(tags[i][0], data_type), 1)) + 2
+                    member_cost += 6 + (data_len or self.CIPTypes.get(data_type, (88,))[0]) + 2
+                if parent_cost < member_cost and 8 + decoder.Size + 8 <= limit:
+                    base_tag = parse_tag_name(parent)[1]
+                    if base_tag not in self.KnownTags:
+                        self.KnownTags[base_tag] = (0xa0, decoder.Size)
+                        parents[len(reads)] = base_tag
+                    for i, name in group:
+                        picks[i] = (len(reads), ('member', decoder.Scalars[name.lower()], decoder))
+                    reads.append([parent, 1, None])
+                    continue
+            for i, name in group:
+                picks[i] = (len(reads), None)
+                reads.append(tags[i])
+
+        for base_tag, group in elements.items():
+            size = self.CIPTypes[self.KnownTags[base_tag][0]][0]
+            # the bytes a read of one element costs, reading the
+            # elements in between costs less than that
+            service_cost = len(self._add_read_service(self._build_ioi(tags[group[0][1]][0], None), 1)) + 2 + 6 + 2
+            group.sort()
+            runs = [[group[0]]]
+            for index, i in group[1:]:
+                start = runs[-1][0][0]
+                gap = index - runs[-1][-1][0] - 1
+                if gap * size <= service_cost and 8 + (index - start + 1) * size + 8 <= limit:
+                    runs[-1].append((index, i))
+                else:
+                    runs.append([(index, i)])
+
+            for run in runs:
+                start = run[0][0]
+                count = run[-1][0] - start + 1
+                if count == 1:
+                    for index, i in run:
+                        picks[i] = (len(reads), None)
+                        reads.append(tags[i])
+                    continue
+                for index, i in run:
+                    picks[i] = (len(reads), ('element', index - start))
+                reads.append(['{}[{}]'.format(base_tag, start), count, None])
+
+        return reads, picks, parents
+
+    def _pick_value(self, value, pick):
+        """
+        Take the value of a tag out of the value of the read it was
+        combined into
+        """
+        if pick[0] == 'element':
+            if not isinstance(value, list):
+                value = value.tolist()
+            return value[pick[1]]
+
+        name, decoder = pick[1], pick[2]
+        if isinstance(value, dict):
+            return value[name]
+        if hasattr(value, '_asdict'):
+            return getattr(value, name)
+        return decoder.decode(value)[name]
+
+    def _fits_multi_read(self, tag):
+        """
+        Check if the reply to reading tag ([tag, count, type]) fits in a
+        multi-service packet
+        """
+        tag_name, base_tag, index = parse_tag_name(tag[0])
+        if base_tag not in self.KnownTags:
+            return False
+
+        data_type, byte_size = self.KnownTags[base_tag]
+        element_count = self._read_element_count(tag_name, data_type, index, tag[1])
+        reply_size = self._read_reply_size(data_type, byte_size, element_count)
+
+        # the reply service, status and service count, and the offset
+        return 6 + reply_size + 2 <= self.ConnectionSize - 24
+
+    def _format_read_tags(self, tags):
+        """
+        Format the tags to read as [tag, length, type]
+        """
         new_tags = []
         for tag in tags:
             if isinstance(tag, (list, tuple)):
@@ -428,78 +894,71 @@ class PLC(object):
             else:
                 new_tags.append([tag, 1, None])
 
-        tags = new_tags
+        return new_tags
 
-        # get data types of unknown tags
-        self._get_unknown_types(tags)
+    def _multi_read(self, tags):
+        """
+        Read tags using multi-service messaging
+        """
+        return self._run(self._multi_read_requests(tags))
 
-        # send the read requests.  Array request won't use multi message service
-        current_requests = []
-        responses = []
-        for tag in tags:
-            if tag[1] > 1:
-                # array read
-                if current_requests:
-                    responses += [Response(tag, value, status) for tag, value, status in self._multi_read(current_requests)]
-                responses.append(self._read_tag(*tag))
-                current_requests = []
-            else:
-                current_requests.append(tag)
+    def _multi_read_requests(self, tags, as_buffer=False):
+        """
+        Request generator for _multi_read, as_buffer applies to the
+        arrays in tags
+        """
+        requests, new_tags, positions = self._build_multi_read_packets(tags)
 
-        # send any leftover requests
-        if current_requests:
-            responses += [Response(tag, value, status) for tag, value, status in self._multi_read(current_requests)]
+        # the packets don't depend on each other, so they are pipelined
+        replies = yield requests
 
-        return responses
+        # the packets are filled with tags from anywhere in the list,
+        # put the replies back in the order the tags were requested
+        response = [None] * len(tags)
+        for i, (status, ret_data) in enumerate(replies):
+            # return error if no data is returned, keeping one reply
+            # per requested tag so the caller can match them up
+            if not ret_data:
+                for position in positions[i]:
+                    response[position] = [tags[position][0], None, status]
+                continue
 
-    def _multi_read(self, tags):
+            values = self._parse_multi_read_response(ret_data, new_tags[i], as_buffer)
+            for position, value in zip(positions[i], values):
+                response[position] = value
+
+        return response
+
+    def _build_multi_read_packets(self, tags):
         """
-        Read tags using multi-service messaging
+        Build the multi-service read requests for the tags, as few of
+        them as the connection size allows.
+
+        returns the requests, the tags read by each of them and the
+        position in tags of each of those tags
         """
         # generate a list of service requests
-        ret_services = self._generate_read_service_list(tags)
+        ret_services, positions = self._generate_read_service_list(tags)
 
         # format tags to match services
-        new_tags = []
-        count = 0
-        for s in (ret_services):
-            temp = []
-            for v in s:
-                temp.append(tags[count])
-                count += 1
-            new_tags.append(temp)
-
-        response = []
-        for i, services in enumerate(ret_services):
-            header = self._build_multi_service_header()
-            tag_count = pack("<H", len(new_tags[i]))
-            # # calculate the offsets
-            current_offset = len(new_tags[i]) * 2 + 2
-            offsets = pack("<H", current_offset)
-            for j in range(len(services)-1):
-                current_offset += len(services[j])
-                offsets += pack("<H", current_offset)
-
-            segments = b''.join(s for s in services)
-            request = header + tag_count + offsets + segments
-
-            status, ret_data = self.conn.send(request)
-
-            # return error if no data is returned
-            if not ret_data:
-                return [[t, None, status] for t in new_tags[i]]
+        new_tags = [[tags[position] for position in packet] for packet in positions]
 
-            response.extend(self._parse_multi_read_response(ret_data, new_tags[i]))
+        requests = [self._build_multi_service_request(services) for services in ret_services]
 
-        return response
+        return requests, new_tags, positions
 
     def _generate_read_service_list(self, tags):
         """
         Generate a list of read services for the multi-message service.
-        Once we have a complete list, they'll be split into packet sized
-        sub lists.
+        Once we have a complete list, they'll be packed into as few
+        packets as possible, using the size of each request and of the
+        reply it will get.
+
+        returns the services in each packet, and the position in tags
+        of the tag each of them reads
         """
         read_services = []
+        sizes = []
         for tag in tags:
             tag_name, base_tag, index = parse_tag_name(tag[0])
 
@@ -511,50 +970,194 @@ class PLC(object):
                 byte_size = 88
 
             ioi = self._build_ioi(tag_name, data_type)
-
-            if data_type == 0xd3:
-                element_count = get_word_count(index, tag[1], 32)
-            elif bit_of_word(tag_name) and data_type is not None:
-                    bit_pos = int(tag_name.split('.')[-1])
-                    bit_count = self.CIPTypes[data_type][0] * 8
-                    element_count = get_word_count(bit_pos, tag[1], bit_count)
-            elif data_type == None:
-                element_count = 1
-            else:
-                element_count = tag[1]
+            element_count = self._read_element_count(tag_name, data_type, index, tag[1])
             service = self._add_read_service(ioi, element_count)
-            read_services.append([service, data_type, byte_size])
-
-        # calculate packet sizes
-        send_packet_size = 30
-        receive_packet_size = 28
-        current = []
-        accumulated = []
-        for service, data_type, byte_size in read_services:
-            send_packet_size += len(service) + 2
-            if data_type == 0xa0:
-                # but this might not be a string!
-                receive_size = 8 + byte_size + 2
-            elif data_type is None:
-                receive_size = 8 + byte_size + 2
-                receive_packet_size += 8 + self.CIPTypes[0xa0][0] + 2
+            read_services.append(service)
+            sizes.append((len(service), self._read_reply_size(data_type, byte_size, element_count)))
+
+        packets = self._pack_services(sizes, len(self._build_multi_service_header()))
+        return [[read_services[i] for i in packet] for packet in packets], packets
+
+    def _read_element_count(self, tag_name, data_type, index, count):
+        """
+        Number of elements a read service asks for to read count
+        elements of tag_name, words for BOOL arrays and bits of words
+        """
+        if data_type == 0xd3:
+            return get_word_count(index, count, 32)
+        elif bit_of_word(tag_name) and data_type is not None:
+            bit_pos = int(tag_name.split('.')[-1])
+            bit_count = self.CIPTypes[data_type][0] * 8
+            return get_word_count(bit_pos, count, bit_count)
+        elif data_type is None:
+            return 1
+        else:
+            return count
+
+    def _read_reply_size(self, data_type, byte_size, element_count):
+        """
+        Size of the reply to a read service, the service, status and
+        data type (and the structure handle for structs) followed by
+        the data.  byte_size is the size KnownTags has for the tag,
+        which is 0 when the data type was given instead of read.
+        """
+        if data_type is None:
+            # the type couldn't be read, assume a STRING sized reply
+            return 8 + byte_size
+        if data_type == 0xa0:
+            return 8 + (byte_size or self.CIPTypes[0xa0][0]) * element_count
+        size = self.CIPTypes.get(data_type, self.CIPTypes[0x00])[0]
+        if data_type in (0xd0, 0xda):
+            size = byte_size or size
+        return 6 + size * element_count
+
+    def _pack_services(self, sizes, header_size):
+        """
+        Pack services into as few multi-service packets as possible.
+        sizes has the (request, reply) size of each service, each one
+        also takes 2 bytes in the offset tables of the request and the
+        reply.  The limit leaves the same margin below the connection
+        size as the old packing did.
+
+        Uses first fit decreasing, the largest services are placed
+        first, each one in the first packet it fits in.  A service that
+        is too large for any packet gets one to itself.
+
+        returns the index in sizes of the services in each packet, and
+        records the packets in self.Packing
+        """
+        limit = self.ConnectionSize - 24
+        order = sorted(range(len(sizes)), key=lambda i: max(sizes[i]), reverse=True)
+
+        packets = []
+        used = []
+        for i in order:
+            request = sizes[i][0] + 2
+            reply = sizes[i][1] + 2
+            for p, (request_used, reply_used) in enumerate(used):
+                if request_used + request <= limit and reply_used + reply <= limit:
+                    packets[p].append(i)
+                    used[p] = (request_used + request, reply_used + reply)
+                    break
             else:
-                receive_size = 6 + byte_size + 2
+                packets.append([i])
+                # the request header and the service count, the reply
+                # service, status and service count
+                used.append((header_size + 2 + request, 6 + reply))
+
+        for packet in packets:
+            packet.sort()
+        packets.sort()
 
-            receive_packet_size += receive_size
+        self.Packing = PackingReport(limit, used)
+        return packets
+
+    def _read_plan(self, plan):
+        """
+        Processes the read request for a ReadPlan
+        """
+        conn = self.conn.connect()
+        if not conn[0]:
+            return [Response(t[0], None, conn[1]) for t in plan.Tags]
+
+        return self._run(self._read_plan_requests(plan))
+
+    def _read_plan_requests(self, plan):
+        """
+        Request generator for _read_plan
+        """
+        if plan.Packets is None:
+            yield from self._get_unknown_types_requests(plan.Tags)
+            self._compile_read_plan(plan)
+
+        responses = [None] * len(plan.Tags)
+        if plan.Packets:
+            replies = yield plan.Packets
+            for i, (status, ret_data) in enumerate(replies):
+                positions = plan.positions[i]
+                header = plan.headers[i]
+                values = None
+                if status == 0 and header is not None and ret_data[50:50 + len(header)] == header:
+                    values = unpack_from(plan.formats[i], ret_data, 50 + len(header))
+                    # a tag retyped to a type of the same size keeps the
+                    # header, but not the type word
+                    if values[::2] != plan.types[i]:
+                        values = None
+                if values is not None:
+                    for position, value in zip(positions, values[1::2]):
+                        responses[position] = Response(plan.Tags[position][0], value, 0)
+                elif not ret_data:
+                    for position in positions:
+                        responses[position] = Response(plan.Tags[position][0], None, status)
+                else:
+                    tags = [plan.Tags[position] for position in positions]
+                    values = self._parse_multi_read_response(ret_data, tags)
+                    for position, (tag, value, status) in zip(positions, values):
+                        responses[position] = Response(tag, value, status)
 
-            current.append(service)
-            if send_packet_size >= self.ConnectionSize or receive_packet_size >= self.ConnectionSize:
-                # if it doesn't fit, you must acquit (reset, start new)
-                temp = current.pop()
-                accumulated.append(current)
-                current = []
-                current.append(temp)
-                send_packet_size = 30 + len(temp)
-                receive_packet_size = 28 + receive_size
-        accumulated.append(current)
+        for position in plan.singles:
+            responses[position] = yield from self._read_tag_requests(*plan.Tags[position])
 
-        return accumulated
+        return responses
+
+    def _compile_read_plan(self, plan):
+        """
+        Build the requests for a ReadPlan.  Plain atomic tags are put in
+        packets of their own, so the reply to each of them can be
+        unpacked with a single format.
+        """
+        plain = []
+        other = []
+        formats = {}
+        types = {}
+        for i, tag in enumerate(plan.Tags):
+            tag_name, base_tag, index = parse_tag_name(tag[0])
+            data_type = self.KnownTags.get(base_tag, (None, 0))[0]
+            if self.Micro800 or (tag[1] > 1 and not self._fits_multi_read(tag)):
+                plan.singles.append(i)
+                continue
+
+            fmt = self._atomic_format(tag_name, data_type)
+            if fmt is None or tag[1] > 1:
+                other.append(i)
+            else:
+                plain.append(i)
+                formats[i] = fmt
+                types[i] = data_type
+
+        plan.Packets = []
+        packet_sizes = []
+        for group in (plain, other):
+            if not group:
+                continue
+            requests, packet_tags, packet_positions = self._build_multi_read_packets([plan.Tags[i] for i in group])
+            packet_sizes.extend(self.Packing.Sizes)
+            for request, packet in zip(requests, packet_positions):
+                positions = [group[i] for i in packet]
+                plan.Packets.append(request)
+                plan.positions.append(positions)
+
+                if group is other:
+                    plan.headers.append(None)
+                    plan.formats.append(None)
+                    plan.types.append(None)
+                    continue
+
+                # each reply is the service and status (4 bytes) and the
+                # type word, followed by the value
+                offset = len(positions) * 2 + 2
+                header = pack('<H', len(positions))
+                fmt = '<'
+                for position in positions:
+                    header += pack('<H', offset)
+                    offset += 6 + calcsize(formats[position])
+                    fmt += '4xH' + formats[position][1:]
+                plan.headers.append(header)
+                plan.formats.append(fmt)
+                plan.types.append(tuple(types[position] for position in positions))
+
+        if plan.Packets:
+            plan.Packing = PackingReport(self.Packing.Limit, packet_sizes)
 
     def _batch_write(self, tags):
         """
@@ -568,6 +1171,12 @@ class PLC(object):
         if not conn[0]:
             return [Response(t[0], None, conn[1]) for t in tags]
 
+        return self._run(self._batch_write_requests(tags))
+
+    def _batch_write_requests(self, tags):
+        """
+        Request generator for _batch_write
+        """
         # format the tags so that we have just the tag name or
         # the tag name and data type
         new_tags = []
@@ -577,43 +1186,49 @@ class PLC(object):
             else:
                 new_tags.append((t[0], 1, None))
 
-        self._get_unknown_types(new_tags)
+        yield from self._get_unknown_types_requests(new_tags)
 
-        result = []
-        while len(result) < len(tags):
-            if len(result) == len(tags) - 1:
-                # single tag left over, can't use multi msg service
-                tag = tags[len(result):][0]
-                result.append(self._write_tag(*tag))
-            else:
-                result.extend(self._multi_write(tags[len(result):]))
+        if len(tags) == 1:
+            # single tag, can't use multi msg service
+            response = yield from self._write_tag_requests(*tags[0])
+            return [response]
 
+        result = yield from self._multi_write_requests(tags)
         return result
 
     def _write_tag(self, tag_name, value, data_type=None):
         """
         Processes the write request
         """
-        write_data = []
-
         conn = self.conn.connect()
         if not conn[0]:
             return Response(tag_name, None, conn[1])
 
+        return self._run(self._write_tag_requests(tag_name, value, data_type))
+
+    def _write_tag_requests(self, tag_name, value, data_type=None):
+        """
+        Request generator for _write_tag
+        """
+        write_data = []
+
         tag, base_tag, index = parse_tag_name(tag_name)
-        resp = self._initial_read(tag, base_tag, data_type)
+        resp = yield from self._initial_read_requests(tag, base_tag, data_type)
         if resp[2] != 0 and resp[2] != 6:
             return Response(tag_name, None, resp[2])
 
         data_type = self.KnownTags[base_tag][0]
 
         # check if values passed were a list
-        if not isinstance(value, (list, tuple)):
+        if not isinstance(value, (list, tuple, array, BitArray)):
             value = [value]
 
-        # format the values
-        for v in value:
-            write_data.append(v)
+        # format the values, arrays are kept as they are, so they
+        # can be copied to the requests as they are
+        if isinstance(value, array):
+            write_data = value
+        else:
+            write_data.extend(value)
 
         # save the number of values we are writing
         element_count = len(write_data)
@@ -648,11 +1263,18 @@ class PLC(object):
 
             # handle sending write data
             if len(values) > 1:
-                # write requires multiple packets
+                # write requires multiple packets, each one has the offset
+                # it writes at, so they are pipelined
+                requests = []
                 for w in values:
-                    request = self._add_frag_write_service(count, ioi, w, data_type)
-                    status, ret_data = self.conn.send(request)
+                    requests.append(self._add_frag_write_service(count, ioi, w, data_type))
                     self.Offset += len(w) * self.CIPTypes[data_type][0]
+                replies = yield requests
+                status = 0
+                for reply_status, ret_data in replies:
+                    if reply_status != 0:
+                        status = reply_status
+                        break
             else:
                 # write fits in one packet
                 if bit_of_word(tag_name) or data_type == 0xd3:
@@ -661,41 +1283,81 @@ class PLC(object):
                     for i in range(len(high)):
                         ioi = self._build_ioi(tags[i], data_type)
                         request = self._add_mod_write_service(ioi, data_type, high[i], low[i])
-                        status, ret_data = self.conn.send(request)
+                        status, ret_data = yield request
                 else:
                     request = self._add_write_service(ioi, values[0], data_type)
 
-                    status, ret_data = self.conn.send(request)
+                    status, ret_data = yield request
 
         if len(value) == 1:
             value = value[0]
 
         return Response(tag_name, value, status)
 
+    def _write_handle(self, handle, value):
+        """
+        Processes the write request for a TagHandle
+        """
+        conn = self.conn.connect()
+        if not conn[0]:
+            return Response(handle.TagName, None, conn[1])
+
+        return self._run(self._write_handle_requests(handle, value))
+
+    def _write_handle_requests(self, handle, value):
+        """
+        Request generator for _write_handle.  Writing the same number of
+        values as the handle's count to an atomic tag only packs the
+        values behind the prebuilt request, anything else is written
+        like a tag name would be.
+        """
+        if handle.IOI is None:
+            resp = yield from self._resolve_handle_requests(handle)
+            if resp[2] != 0 and resp[2] != 6:
+                return Response(handle.TagName, None, resp[2])
+
+        if handle.write_header is not None:
+            if isinstance(value, (list, tuple, array)):
+                values = value
+            else:
+                values = [value]
+            if len(values) == handle.Count:
+                if handle.DataType == 0xca or handle.DataType == 0xcb:
+                    request = handle.write_header + pack(handle.write_format, *[float(v) for v in values])
+                else:
+                    request = handle.write_header + pack(handle.write_format, *values)
+                status, ret_data = yield request
+                if len(values) == 1:
+                    value = values[0]
+                return Response(handle.TagName, value, status)
+
+        response = yield from self._write_tag_requests(handle.TagName, value, handle.DataType)
+        return response
+
     def _multi_write(self, write_data):
         """
         Processes the multiple write request
         """
-        service_segments = []
-        segments = b""
-        tag_count = 0
-        self.Offset = 0
-
-        min_tag_size = 24
-        service_segment_size = 8
+        return self._run(self._multi_write_requests(write_data))
 
+    def _multi_write_requests(self, write_data):
+        """
+        Request generator for _multi_write.  All the tags are written,
+        packed into as few multi-service packets as possible, which are
+        pipelined.  A write too large for a packet of its own is sent as
+        a fragmented write.
+        """
         header = self._build_multi_service_header()
 
-        write_values = []
+        # the services that write each tag, with the (tag, value) each
+        # of them is reported as
+        items = []
         for wd in write_data:
 
             tag_name, base_tag, index = parse_tag_name(wd[0])
 
             if base_tag in self.KnownTags.keys():
                 data_type = self.KnownTags[base_tag][0]
-                dt_size = self.CIPTypes[data_type][0]
-                if data_type == 0xa0:
-                    dt_size -= 8
             else:
                 if type(wd[1]) == str:
                     data_type = 0xa0
@@ -703,7 +1365,6 @@ class PLC(object):
                     data_type = 0xca
                 else:
                     data_type = 0x00
-                dt_size = self.CIPTypes[data_type][0]
 
             typ = type(wd[1])
             value = typ(wd[1])
@@ -714,73 +1375,65 @@ class PLC(object):
             else:
                 value = [value]
 
-            rsp_tag_size = min_tag_size + len(base_tag) + dt_size
-
+            services = []
+            write_values = []
             if bit_of_word(tag_name) or data_type == 0xd3:
                 # bool arrays are unique
                 byte_count = self.CIPTypes[data_type][0] * 8
                 high, low, tags = mod_write_masks(tag_name, value, byte_count)
-                temp_segments = []
-                tmp_count = tag_count
-                tmp_write_values = []
-                booleans_fit = True
                 for i in range(len(high)):
                     ioi = self._build_ioi(tags[i], data_type)
-                    write_service = self._add_mod_write_service(ioi, data_type, high[i], low[i])
-
-                    next_request_size = service_segment_size + rsp_tag_size + 2
-                    # check if request size does not exceed (ConnectionSize bytes limit)
-                    if next_request_size <= self.ConnectionSize and rsp_tag_size <= self.ConnectionSize:
-                        service_segment_size = service_segment_size + rsp_tag_size
-                        temp_segments.append(write_service)
-                        tmp_write_values.append((tags[i], value))
-                        tag_count = tag_count + 1
-                    else:
-                        # BOOLs didn't fit in the current packet, abort
-                        booleans_fit = True
-                        tag_count = tmp_count
-                        break
-                if booleans_fit:
-                    # if the booleans fit in this request, append them.
-                    write_values.extend(tmp_write_values)
-                    service_segments.extend(temp_segments)
+                    services.append(self._add_mod_write_service(ioi, data_type, high[i], low[i]))
+                    write_values.append((tags[i], value))
             else:
                 ioi = self._build_ioi(tag_name, data_type)
-                write_service = self._add_write_service(ioi, value, data_type)
+                services.append(self._add_write_service(ioi, value, data_type))
                 write_values.append((wd[0], value))
-                next_request_size = service_segment_size + rsp_tag_size + 2
-
-                # check if request size does not exceed (ConnectionSize bytes limit)
-                if next_request_size <= self.ConnectionSize and rsp_tag_size <= self.ConnectionSize:
-                    service_segment_size = service_segment_size + rsp_tag_size
-                    service_segments.append(write_service)
-                    tag_count = tag_count + 1
-                else:
-                    break
-
-        segment_count = pack('<H', tag_count)
-
-        temp = len(header)
-        if tag_count > 2:
-            temp += (tag_count - 2) * 2
-        offsets = pack('<H', temp)
-
-        # assemble all the segments
-        for i in range(tag_count):
-            segments += service_segments[i]
-
-        for i in range(tag_count - 1):
-            temp += len(service_segments[i])
-            offsets += pack('<H', temp)
-
-        request = header + segment_count + offsets + segments
-        status, ret_data = self.conn.send(request)
+            items.append((wd, services, write_values))
+
+        # the services of a tag are kept in the same packet, the reply
+        # to each one is the service and status
+        sizes = [(sum(len(service) for service in services) + 2 * (len(services) - 1), 6 * len(services) - 2)
+                 for wd, services, write_values in items]
+        packets = self._pack_services(sizes, len(header))
+
+        requests = []
+        packet_values = []
+        single = []
+        limit = self.Packing.Limit
+        for packet in packets:
+            if len(packet) == 1 and len(header) + 4 + sizes[packet[0]][0] > limit:
+                # doesn't fit in a packet, even on its own
+                single.append(packet[0])
+                continue
+            services = []
+            values = []
+            for i in packet:
+                services.extend(items[i][1])
+                values.extend(items[i][2])
+
+            requests.append(self._build_multi_service_request(services))
+            packet_values.append((packet, values))
+
+        replies = yield requests
+
+        responses = {}
+        for (packet, values), (status, ret_data) in zip(packet_values, replies):
+            if not ret_data:
+                # return error if no data is returned
+                result = [Response(w[0], w[1], status) for w in values]
+            else:
+                result = self._parse_multi_write(values, ret_data)
+            for i in packet:
+                responses[i] = result[:len(items[i][2])]
+                result = result[len(items[i][2]):]
 
-        # return error if no data is returned
-        if not ret_data:
-            return [Response(w[0], w[1], status) for w in write_data]
+        for i in single:
+            wd = items[i][0]
+            response = yield from self._write_tag_requests(*wd)
+            responses[i] = [response]
 
-        return self._parse_multi_write(write_values, ret_data)
+        return [response for i in range(len(items)) for response in responses[i]]
 
     def _get_plc_time(self, raw=False):
         """
@@ -790,8 +1443,14 @@ class PLC(object):
         if not conn[0]:
             return Response(None, None, conn[1])
 
+        return self._run(self._get_plc_time_requests(raw))
+
+    def _get_plc_time_requests(self, raw=False):
+        """
+        Request generator for _get_plc_time
+        """
         request = self._cip_message(0x03, 0x8b, 0x01, [0x0b])
-        status, ret_data = self.conn.send(request)
+        status, ret_data = yield request
 
         if status == 0:
             # get the time from the packet
@@ -868,6 +1527,12 @@ class PLC(object):
         if not conn[0]:
             return Response(None, None, conn[1])
 
+        return self._run(self._set_plc_time_requests(dst, set_timezone, timezone))
+
+    def _set_plc_time_requests(self, dst, set_timezone=False, timezone=None):
+        """
+        Request generator for _set_plc_time
+        """
         current_time = int(time.time() * 1000000)
         time_bytes = pack("<Q", current_time)
 
@@ -902,7 +1567,7 @@ class PLC(object):
             tz = timezone.encode("utf-8")[:60]
             tz_string = pack("<I", len(tz)) + tz + b"\x00" * (60 - len(tz))
             request = self._cip_message(0x04, 0x8b, 0x01, [0x08], [tz_string])
-            status, ret_data = self.conn.send(request)
+            status, ret_data = yield request
             if status != 0:
                 return Response(None, current_time, status)
 
@@ -912,7 +1577,7 @@ class PLC(object):
             # adjustment and the clock reads an hour off while DST is enabled.
             request = self._cip_message(0x04, 0x8b, 0x01, [0x09],
                                         [pack("<h", dst_adjust)])
-            status, ret_data = self.conn.send(request)
+            status, ret_data = yield request
             if status != 0:
                 return Response(None, current_time, status)
 
@@ -920,7 +1585,7 @@ class PLC(object):
         request = self._cip_message(0x04, 0x8b, 0x01, [0x06, 0x0a],
                                     [time_bytes, dst_value])
 
-        status, ret_data = self.conn.send(request)
+        status, ret_data = yield request
 
         return Response(None, current_time, status)
 
@@ -933,6 +1598,12 @@ class PLC(object):
         if not conn[0]:
             return Response(None, None, conn[1])
 
+        return self._run(self._set_plc_gateway_requests(gateway))
+
+    def _set_plc_gateway_requests(self, gateway):
+        """
+        Request generator for _set_plc_gateway
+        """
         # validate and pack the gateway address before touching the PLC
         try:
             gateway_bytes = self._pack_ip(gateway)
@@ -944,7 +1615,7 @@ class PLC(object):
         # The structure is: IP(4), mask(4), gateway(4), name server(4),
         # name server 2(4), domain name (STRING), all little endian.
         request = self._cip_message(0x0e, 0xf5, 0x01, 0x05)
-        status, ret_data = self.conn.send(request)
+        status, ret_data = yield request
         if status != 0:
             return Response(None, gateway, status)
 
@@ -955,7 +1626,7 @@ class PLC(object):
         # replace the gateway (the third UDINT) and write it back
         config[8:12] = gateway_bytes
         request = self._cip_message(0x10, 0xf5, 0x01, 0x05, bytes(config))
-        status, ret_data = self.conn.send(request)
+        status, ret_data = yield request
 
         return Response(None, gateway, status)
 
@@ -978,13 +1649,19 @@ class PLC(object):
         if not conn[0]:
             return Response(None, None, conn[1])
 
+        return self._run(self._get_tag_list_requests(all_tags))
+
+    def _get_tag_list_requests(self, all_tags):
+        """
+        Request generator for _get_tag_list
+        """
         self.Offset = 0
         status = 6
         tags = []
 
         while status == 6:
             request = self._build_tag_list_request(program_name=None)
-            status, ret_data = self.conn.send(request)
+            status, ret_data = yield request
             if status == 0 or status == 6:
                 tags += self._parse_packet(ret_data, program_name=None)
                 self.Offset += 1
@@ -992,21 +1669,53 @@ class PLC(object):
                 return Response(None, None, status)
 
         if all_tags:
-            for program_name in self.ProgramNames:
+            response = yield from self._program_tag_lists_requests(self.ProgramNames)
+            if response.Status != 'Success':
+                return response
+            tags += response.Value
 
-                self.Offset = 0
-                status = 6
+        self.TagList = tags
+        return Response(None, tags, status)
 
-                while status == 6:
-                    self.Offset += 1
-                    request = self._build_tag_list_request(program_name)
-                    status, ret_data = self.conn.send(request)
-                    if status == 0 or status == 6:
-                        tags += self._parse_packet(ret_data, program_name)
-                    else:
-                        return Response(None, None, status)
+    def _program_tag_lists_requests(self, program_names):
+        """
+        Request generator that gets the tags of several programs.  The
+        pages of one program have to be requested one after the other,
+        each one starts after the last tag of the one before, but the
+        programs don't depend on each other.  So the next page of every
+        program is requested at once, and the requests are pipelined.
+
+        The tags are returned in the order of program_names, the same as
+        getting the programs one after the other.
+        """
+        offsets = {program_name: 1 for program_name in program_names}
+        program_tags = {program_name: [] for program_name in program_names}
+        status = 0
+
+        pending = list(offsets)
+        while pending:
+            requests = []
+            for program_name in pending:
+                self.Offset = offsets[program_name]
+                requests.append(self._build_tag_list_request(program_name))
+
+            replies = yield requests
+
+            next_pending = []
+            for program_name, (status, ret_data) in zip(pending, replies):
+                if status != 0 and status != 6:
+                    return Response(None, None, status)
+                program_tags[program_name] += self._parse_packet(ret_data, program_name)
+                # _parse_packet leaves the instance of the last tag in Offset
+                offsets[program_name] = self.Offset + 1
+                if status == 6:
+                    next_pending.append(program_name)
+            pending = next_pending
+
+        tags = []
+        for program_name in program_names:
+            tags += program_tags[program_name]
 
-        self.TagList = tags
         return Response(None, tags, status)
 
     def _get_program_tag_list(self, program_name):
@@ -1017,6 +1726,12 @@ class PLC(object):
         if not conn[0]:
             return Response(None, None, conn[1])
 
+        return self._run(self._get_program_tag_list_requests(program_name))
+
+    def _get_program_tag_list_requests(self, program_name):
+        """
+        Request generator for _get_program_tag_list
+        """
         self.Offset = 0
         status = 6
         tags = []
@@ -1024,7 +1739,7 @@ class PLC(object):
         while status == 6:
             self.Offset += 1
             request = self._build_tag_list_request(program_name)
-            status, ret_data = self.conn.send(request)
+            status, ret_data = yield request
             if status == 0 or status == 6:
                 tags += self._parse_packet(ret_data, program_name)
             else:
@@ -1037,6 +1752,12 @@ class PLC(object):
         Request information about UDT makeup.
         Returns the tag list with UDT name appended
         """
+        return self._run(self._get_udt_requests(tag_list))
+
+    def _get_udt_requests(self, tag_list):
+        """
+        Request generator for _get_udt
+        """
         # get only tags that are a struct
         struct_tags = [x for x in tag_list if x.Struct == 1]
         # reduce our struct tag list to only unique instances
@@ -1048,24 +1769,33 @@ class PLC(object):
         self.UDTByName = {}
         template = {}
         while len(unique):
-            iter_template = {}
+            # the attributes of all the templates of this nesting level
+            # are requested at once
+            instances = {}
             for u in unique:
                 if u.DataTypeValue not in self.UDT.keys():
-                    temp = self._get_template_attribute(u.DataTypeValue)
-
-                    block = temp[46:]
-                    if len(block) > 24:
-                        val = unpack_from('<I', block, 10)[0]
-                        words = (val * 4) - 23
-                        size = int(math.ceil(words / 4.0)) * 4
-                        member_count = int(unpack_from('<H', block, 24)[0])
-                        iter_template[u.DataTypeValue] = template[u.DataTypeValue] = [size, '', member_count]
-                    else:
-                        print("Received invalid template attribute for", u.TagName)
+                    instances.setdefault(u.DataTypeValue, u)
+            blocks = yield from self._get_template_attributes_requests(list(instances))
+
+            iter_template = {}
+            for instance, u in instances.items():
+                block = blocks[instance]
+                if len(block) > 24:
+                    val = unpack_from('<I', block, 10)[0]
+                    words = (val * 4) - 23
+                    size = int(math.ceil(words / 4.0)) * 4
+                    member_count = int(unpack_from('<H', block, 24)[0])
+                    struct_size = unpack_from('<I', block, 18)[0]
+                    iter_template[instance] = template[instance] = [size, '', member_count, struct_size]
+                else:
+                    print("Received invalid template attribute for", u.TagName)
+
+            # then the templates, pipelined
+            templates = yield from self._get_templates_requests([(key, value[0]) for key, value in iter_template.items()])
 
             unique = []
             for key, value in iter_template.items():
-                t = self._get_template(key, value[0])
+                t = templates[key]
                 member_count = value[2]
                 size = member_count * 8
                 p = t[50:]
@@ -1080,6 +1810,7 @@ class PLC(object):
                 udt = UDT()
                 udt.Type = key
                 udt.Name = name
+                udt.Size = value[3]
                 for i in range(1, member_count + 1):
                     field = Tag()
                     field.UDT = udt
@@ -1139,32 +1870,110 @@ class PLC(object):
         """
         Get the attributes of a UDT
         """
+        return self._run(self._get_template_attribute_requests(instance))
+
+    def _get_template_attribute_requests(self, instance):
+        """
+        Request generator for _get_template_attribute
+        """
         request = self._cip_message(0x03, 0x6c, instance, [0x04, 0x03, 0x02, 0x01])
-        status, ret_data = self.conn.send(request)
+        status, ret_data = yield request
         return ret_data
 
+    def _get_template_attributes_requests(self, instances):
+        """
+        Request generator that gets the attributes of several templates,
+        packed in multiple service requests.  A packet that fails is
+        requested again one template at a time.
+
+        returns {instance: reply}, each reply starting at the reply
+        service like _get_template_attribute's does at byte 46
+        """
+        blocks = {}
+        if len(instances) > 1 and not self.Micro800:
+            services = [self._cip_message(0x03, 0x6c, instance, [0x04, 0x03, 0x02, 0x01]) for instance in instances]
+            # the reply has the 4 attributes, the ids and status of each
+            sizes = [(len(service), 4 + 2 + 8 * 4) for service in services]
+            packets = self._pack_services(sizes, len(self._build_multi_service_header()))
+            requests = [self._build_multi_service_request([services[i] for i in packet]) for packet in packets]
+
+            replies = yield requests
+            for packet, (status, ret_data) in zip(packets, replies):
+                if ret_data:
+                    for i, reply in zip(packet, self._multi_service_replies(ret_data)):
+                        blocks[instances[i]] = reply
+
+        for instance in instances:
+            if instance not in blocks:
+                ret_data = yield from self._get_template_attribute_requests(instance)
+                blocks[instance] = ret_data[46:]
+
+        return blocks
+
+    def _get_templates_requests(self, templates):
+        """
+        Request generator that reads several templates, templates is a
+        list of (instance, data_len).  The fragments of a template are
+        read one after the other, but the next fragment of every
+        template is requested at once, so they are pipelined.
+
+        returns {instance: data} with the data in the same form as
+        _get_template returns it
+        """
+        data = {instance: [] for instance, data_len in templates}
+        part_offsets = {instance: 0 for instance, data_len in templates}
+        pending = [(instance, data_len) for instance, data_len in templates if data_len > 0]
+        while pending:
+            requests = []
+            for instance, data_len in pending:
+                packet_data = pack("<IH", part_offsets[instance], data_len - part_offsets[instance])
+                requests.append(self._cip_message(0x4c, 0x6c, instance, None, packet_data))
+
+            replies = yield requests
+
+            next_pending = []
+            for (instance, data_len), (status, ret_data) in zip(pending, replies):
+                if data[instance]:
+                    data[instance].append(memoryview(ret_data)[50:])
+                    part_offsets[instance] += len(data[instance][-1])
+                else:
+                    data[instance].append(ret_data)
+                    part_offsets[instance] = len(ret_data) - 50
+                if (status == 0 or status == 6) and data_len - part_offsets[instance] > 0:
+                    next_pending.append((instance, data_len))
+            pending = next_pending
+
+        return {instance: b''.join(parts) for instance, parts in data.items()}
+
     def _get_template(self, instance, data_len):
         """
         Get the members of a UDT, so we can get it
         """
-        data = b''
+        return self._run(self._get_template_requests(instance, data_len))
+
+    def _get_template_requests(self, instance, data_len):
+        """
+        Request generator for _get_template
+        """
+        data = []
         status = 0
         part_offset = 0
         remaining = data_len
         while remaining > 0 and not status:
             packet_data = pack("<IH", part_offset, remaining)
             request = self._cip_message(0x4c, 0x6c, instance, None, packet_data)
-            status, ret_data = self.conn.send(request)
+            status, ret_data = yield request
             if status == 6:
                 status = 0
-            if len(data):
-                part = ret_data[50:]
-                ret_data = part
-            data = data + ret_data
-            part_offset = len(data) - 50
+            if data:
+                data.append(memoryview(ret_data)[50:])
+                part_offset += len(data[-1])
+            else:
+                data.append(ret_data)
+                part_offset = len(ret_data) - 50
             remaining = data_len - part_offset
 
-        return data
+        return b''.join(data)
 
     def _read_template_service(self, instance, data_len, offset=0):
         """
@@ -1185,15 +1994,7 @@ class PLC(object):
         if not conn[0]:
             return Response(None, Device(), conn[1])
 
-        request = self._cip_message(0x01, 0x01, 0x01)
-        status, ret_data = self.conn.send(request, False, slot)
-        pad = pack('<I', 0x00)
-        ret_data = pad + ret_data
-
-        if status == 0:
-            return Response(None, Device.parse(ret_data, self.IPAddress), status)
-        else:
-            return Response(None, Device(), status)
+        return self._run(self._get_properties_requests(slot))
 
     def _get_device_properties(self):
         """
@@ -1204,13 +2005,19 @@ class PLC(object):
         if not conn[0]:
             return Response(None, Device(), conn[1])
 
+        return self._run(self._get_properties_requests(None))
+
+    def _get_properties_requests(self, slot):
+        """
+        Request generator for _get_module_properties, and for
+        _get_device_properties when slot is None
+        """
         request = self._cip_message(0x01, 0x01, 0x01)
-        status, ret_data = self.conn.send(request, False)
-        pad = pack('<I', 0x00)
-        ret_data = pad + ret_data
+        status, ret_data = yield request, False, slot
 
         if status == 0:
-            return Response(None, Device.parse(ret_data, self.IPAddress), status)
+            pad = pack('<I', 0x00)
+            return Response(None, Device.parse(pad + ret_data, self.IPAddress), status)
         else:
             return Response(None, Device(), status)
 
@@ -1219,8 +2026,14 @@ class PLC(object):
         if not conn[0]:
             return Response(None, None, conn[1])
 
+        return self._run(self._message_requests(cip_service, cip_class, cip_instance, cip_attribute, data))
+
+    def _message_requests(self, cip_service, cip_class, cip_instance, cip_attribute, data):
+        """
+        Request generator for _message
+        """
         request = self._cip_message(cip_service, cip_class, cip_instance, cip_attribute, data)
-        status, ret_data = self.conn.send(request, False, self.ProcessorSlot)
+        status, ret_data = yield request, False, self.ProcessorSlot
 
         return Response(None, ret_data, status)
 
@@ -1308,75 +2121,98 @@ class PLC(object):
 
         We also might be reading arrays, a bool from arrays (atomic), strings.
             Oh and multi-dim arrays, program scope tags...
+
+        With SymbolInstanceAddressing, the tag itself is addressed by its
+        symbol instance from the tag list instead of its name, members
+        and indexes are the same.
         """
         ioi = b""
-        segments = tag_name.split(".")
+        segments = parse_tag_path(tag_name).Segments
 
         # boolean arrays are special
-        last_segment = segments[-1]
-        if last_segment.endswith("]") and data_type == 0xd3:
-            _, base_tag, index = parse_tag_name(last_segment)
-            index = int(index/32)
-            segments[-1] = "{}[{}]".format(base_tag, index)
-
-        for segment in segments:
-            if segment.endswith("]"):
-                _, base_tag, index = parse_tag_name(segment)
-
-                if data_type == None:
-                    # assume index 0 with arrays when data type
-                    # is unknown
-                    if isinstance(index, list):
-                        # multi-dim arrays
-                        index = [0 for _ in index]
-                    else:
-                        index = 0
+        if data_type == 0xd3 and tag_name.endswith("]"):
+            base_tag, index = segments[-1]
+            segments = segments[:-1] + [(base_tag, int(index/32))]
+
+        if self.SymbolInstanceAddressing:
+            ioi, segments = self._symbol_instance_path(segments)
 
+        for base_tag, index in segments:
+            if base_tag is not None:
                 name_length = len(base_tag)
                 ioi += pack('<BB', 0x91, name_length)
                 ioi += base_tag.encode('utf-8')
                 if name_length % 2:
-                    name_length += 1
                     ioi += pack('<B', 0x00)
 
+            if index is None:
+                # not an array
+                continue
+
+            if data_type == None:
+                # assume index 0 with arrays when data type
+                # is unknown
                 if isinstance(index, list):
-                    for value in index:
-                        if value < 256:
-                            ioi += pack('<BB', 0x28, value)
-                        if 65536 > value > 255:
-                            ioi += pack('<HH', 0x29, value)
-                        if value > 65535:
-                            ioi += pack('<HI', 0x2A, value)
+                    # multi-dim arrays
+                    index = [0 for _ in index]
                 else:
-                    if index < 256:
-                        ioi += pack('<BB', 0x28, index)
-                    if 65536 > index > 255:
-                        ioi += pack('<HH', 0x29, index)
-                    if index > 65535:
-                        ioi += pack('<HI', 0x2A, index)
-
-            else:
-                """
-                for non-array segment of tag
-                the try might be a stupid way of doing this.  If the portion of the tag
-                    can be converted to an integer successfully then we must be just looking
-                    for a bit from a word rather than a UDT.  So we then don't want to assemble
-                    the read request as a UDT, just read the value of the DINT.  We'll figure out
-                    the individual bit in the read function.
-                """
-                try:
-                    if int(segment) <= 31:
-                        pass
-                except Exception:
-                    tag_size = int(len(segment))
-                    ioi += pack('<BB', 0x91, tag_size)
-                    ioi += segment.encode('utf-8')
-                    if tag_size % 2:
-                        tag_size += 1
-                        ioi += pack('<B', 0x00)
+                    index = 0
+
+            if not isinstance(index, list):
+                index = [index]
+            for value in index:
+                if value < 256:
+                    ioi += pack('<BB', 0x28, value)
+                if 65536 > value > 255:
+                    ioi += pack('<HH', 0x29, value)
+                if value > 65535:
+                    ioi += pack('<HI', 0x2A, value)
 
         return ioi
 
+    def _symbol_instance_path(self, segments):
+        """
+        The path to the symbol instance (class 0x6B) of the tag the
+        segments start with, taken from the tag list, preceded by the
+        program name for program scoped tags.
+
+        returns the path and the segments left to add, the tag's own
+        segment without its name so only its index is added.  When the
+        tag isn't in the tag list, the path is empty and the segments
+        are left as they are.
+        """
+        tag_list, instances = self.symbol_instances
+        if tag_list is not self.TagList:
+            instances = dict((tag.TagName.lower(), tag.InstanceID) for tag in self.TagList)
+            self.symbol_instances = (self.TagList, instances)
+
+        program = segments[0][0].startswith('Program:') and len(segments) > 1
+        if program:
+            name = '{}.{}'.format(segments[0][0], segments[1][0])
+            symbol = 1
+        else:
+            name = segments[0][0]
+            symbol = 0
+
+        instance = instances.get(name.lower())
+        if instance is None:
+            return b'', segments
+
+        path = b''
+        if program:
+            program_name = segments[0][0]
+            path += pack('<BB', 0x91, len(program_name)) + program_name.encode('utf-8')
+            if len(program_name) % 2:
+                path += pack('<B', 0x00)
+
+        path += pack('<H', 0x6B20)
+        if instance < 256:
+            path += pack('<BB', 0x24, instance)
+        else:
+            path += pack('<HH', 0x25, instance)
+
+        return path, [(None, segments[symbol][1])] + segments[symbol + 1:]
+
     def _decode_ioi(self, data):
         """ Extract the tag name and value(s) from the packet
         """
@@ -1500,26 +2336,7 @@ class PLC(object):
             type_len = 0x00
             write_service += pack('<BBH', data_type, type_len, len(write_data))
 
-        for value in write_data:
-            if data_type == 0xca or data_type == 0xcb:
-                value = float(value)
-            elif data_type == 0xa0:
-                value = self._make_standard_string(value)
-            elif data_type == 0xda or data_type == 0xd0:
-                value = self._make_special_string(value)
-            try:
-                for i in range(len(value)):
-                    el = value[i]
-                    write_service += pack(self.CIPTypes[data_type][2], el)
-            except Exception:
-                # handling special format for micropython for bools
-                # boolean format ? doesn't exist for upy struct module
-                if self.CIPTypes[data_type][2] == '<?' and is_micropython():
-                    write_service += pack('B', value)
-                else:
-                    write_service += pack(self.CIPTypes[data_type][2], value)
-
-        return write_service
+        return write_service + self._pack_write_values(write_data, data_type)
 
     def _add_mod_write_service(self, ioi, data_type, mask_high, mask_low):
         """
@@ -1559,8 +2376,25 @@ class PLC(object):
         request += pack('<H', count)
         request += pack('<I', self.Offset)
 
-        for value in write_data:
+        return request + self._pack_write_values(write_data, data_type)
 
+    def _pack_write_values(self, write_data, data_type):
+        """
+        Pack the values to write.  Atomic values are packed with a
+        single struct.pack call, or copied straight from an array.array
+        of the same type, strings are packed one at a time.
+        """
+        fmt = self.CIPTypes[data_type][2]
+        if data_type not in (0xa0, 0xd0, 0xda) and calcsize(fmt) == self.CIPTypes[data_type][0]:
+            if not (fmt == '<?' and is_micropython()):
+                if isinstance(write_data, array) and write_data.typecode == fmt[1:] and sys.byteorder == 'little':
+                    return write_data.tobytes()
+                if data_type == 0xca or data_type == 0xcb:
+                    write_data = [float(value) for value in write_data]
+                return pack('<{}{}'.format(len(write_data), fmt[1:]), *write_data)
+
+        packed = []
+        for value in write_data:
             if data_type == 0xca or data_type == 0xcb:
                 value = float(value)
             elif data_type == 0xa0:
@@ -1570,11 +2404,16 @@ class PLC(object):
             try:
                 for i in range(len(value)):
                     el = value[i]
-                    request += pack(self.CIPTypes[data_type][2], el)
+                    packed.append(pack(fmt, el))
             except Exception:
-                request += pack(self.CIPTypes[data_type][2], value)
+                # handling special format for micropython for bools
+                # boolean format ? doesn't exist for upy struct module
+                if fmt == '<?' and is_micropython():
+                    packed.append(pack('B', value))
+                else:
+                    packed.append(pack(fmt, value))
 
-        return request
+        return b''.join(packed)
 
     def _build_multi_service_header(self):
         """
@@ -1583,6 +2422,31 @@ class PLC(object):
         request = self._cip_message(0x0a, 0x02, 0x01)
         return request
 
+    def _build_multi_service_request(self, services):
+        """
+        Multiple service request made of services, the header, the
+        service count and the offset of each service
+        """
+        header = self._build_multi_service_header()
+        current_offset = len(services) * 2 + 2
+        offsets = pack('<H', current_offset)
+        for service in services[:-1]:
+            current_offset += len(service)
+            offsets += pack('<H', current_offset)
+
+        return header + pack('<H', len(services)) + offsets + b''.join(services)
+
+    def _multi_service_replies(self, data):
+        """
+        Split the reply to a multiple service request into the reply to
+        each service, each one starting with the reply service, like the
+        reply to a single request does at byte 46
+        """
+        service_count = unpack_from('<H', data, 50)[0]
+        offsets = [50 + offset for offset in unpack_from('<{}H'.format(service_count), data, 52)]
+        offsets.append(len(data))
+        return [data[offsets[i]:offsets[i + 1]] for i in range(service_count)]
+
     def _build_tag_list_request(self, program_name):
         """
         Build the request for the PLC tags
@@ -1616,30 +2480,86 @@ class PLC(object):
 
         return request
 
-    def _parse_reply(self, tag_name, elements, data):
+    def _struct_decoder(self, tag_name, struct_format=None):
+        """
+        The StructDecoder for the UDT of tag_name, compiled the first
+        time it's needed.  None when StructFormat (or struct_format) is
+        'bytes' or the UDT isn't known.
+        """
+        struct_format = struct_format or self.StructFormat
+        if struct_format not in ('dict', 'record') or not self.UDT:
+            return None
+
+        # the UDT is the same whatever the indexes are
+        names = [name for name, index in parse_tag_path(tag_name).Segments]
+        key = ('.'.join(names).lower(), struct_format)
+        decoder = self.struct_decoders.get(key)
+        if decoder is not None and self.UDT.get(decoder.UDT.Type) is decoder.UDT:
+            return decoder
+
+        # find the tag, then follow the members down to the UDT
+        if names[0].startswith('Program:') and len(names) > 1:
+            names = [names[0] + '.' + names[1]] + names[2:]
+        tag = None
+        for t in self.TagList:
+            if t.TagName.lower() == names[0].lower():
+                tag = t
+                break
+        if tag is None or not tag.Struct:
+            return None
+        udt = self.UDT.get(tag.DataTypeValue)
+        for name in names[1:]:
+            field = None
+            if udt is not None:
+                field = udt.FieldsByName.get(name)
+                if field is None:
+                    field = next((f for f in udt.Fields if f.TagName.lower() == name.lower()), None)
+            if field is None or not field.Struct:
+                return None
+            udt = self.UDT.get(field.DataTypeValue)
+        if udt is None:
+            return None
+
+        decoder = StructDecoder(udt, self.UDT, self.CIPTypes, self.StringEncoding, struct_format == 'record')
+        self.struct_decoders[key] = decoder
+        return decoder
+
+    def _parse_reply(self, tag_name, elements, data, as_buffer=False):
         """
         Gets the replies from the PLC
         In the case of BOOL arrays and bits of
             a word, we do some reformatting
         """
-        tag, base_tag, index = parse_tag_name(tag_name)
-        data_type = self.KnownTags[base_tag][0]
+        path = parse_tag_path(tag_name)
+        data_type = self.KnownTags[path.BaseTag][0]
 
-        # if A bit of word was requested
-        if bit_of_word(tag_name):
-            words = self._get_values(tag_name, data)
-            values = self._words_to_bits(tag_name, words, count=elements)
-        elif data_type == 0xd3:
-            words = self._get_values(tag_name, data)
-            values = self._words_to_bits(tag_name, words, count=elements)
+        # if A bit of word or a BOOL array was requested, the bits
+        # are taken straight from the words in the reply
+        if path.Bit is not None or data_type == 0xd3:
+            if path.Bit is not None:
+                bit_pos = path.Bit
+            else:
+                bit_pos = path.Index % 32
+            word_size = self.CIPTypes[data_type][0]
+            end = 2 + (len(data) - 2) // word_size * word_size
+            count = max(min(elements, (end - 2) * 8 - bit_pos), 0)
+            if as_buffer or (self.BoolFormat == 'packed' and count > 1):
+                values = BitArray.from_int(bytes_to_int(data[2:end], bit_pos, count), count)
+            else:
+                values = bytes_to_bits(data[2:end], bit_pos, count)
+        elif as_buffer:
+            values = self._get_values(tag_name, data, 'buffer')
         else:
-            values = self._get_values(tag_name, data)
+            values = self._get_values(tag_name, data, self.ArrayFormat)
 
         return values
 
-    def _get_values(self, tag_name, data):
+    def _get_values(self, tag_name, data, array_format='list'):
         """
         Extract the values from the reply/replies
+
+        Arrays of atomic types are unpacked in one go, as the
+        array_format asks for (see ArrayFormat)
         """
         tag, base_tag, index = parse_tag_name(tag_name)
         data_type = self.KnownTags[base_tag][0]
@@ -1650,14 +2570,23 @@ class PLC(object):
         num_bytes = len(data) - data_size
         counter = 0
 
+        if data_type not in (0xa0, 0xd0, 0xda) and calcsize(fmt) == data_size:
+            if not (fmt == '<?' and is_micropython()):
+                count = max(len(data) - 2, 0) // data_size
+                self.Offset += count * data_size
+                return unpack_array(fmt, data, 2, count, array_format)
+
         # this is going to check if the data type was a struct
         # if so, return the raw data
         if data_type == 0xa0:
             tmp = unpack_from('<h', data, 2)[0]
             if tmp != self.StringID:
+                self.Offset += len(data)
+                decoder = self._struct_decoder(tag_name)
+                if decoder is not None and decoder.Size and array_format != 'buffer':
+                    return decoder.decode_array(data, 4, (len(data) - 4) // decoder.Size)
                 d = data[4:4 + len(data)]
                 values.append(d)
-                self.Offset += len(data)
                 return values
 
         while True:
@@ -1671,24 +2600,23 @@ class PLC(object):
                 values.append(str(s.decode(self.StringEncoding)))
 
             elif data_type == 0xda or data_type == 0xd0:
-                # remove the data type
-                data = data[2:]
-                while len(data) > 0:
-                    
+                # skip the data type
+                position = 2
+                while position < len(data):
+
                     if data_type == 0xd0:
                         # special string
-                        length = unpack_from("<H", data, 0)[0]
-                        data = data[2:]
+                        length = unpack_from("<H", data, position)[0]
+                        position += 2
                     else:
                         # Micro800 String
-                        length = unpack_from("<B", data, 0)[0]
-                        data = data[1:]
+                        length = unpack_from("<B", data, position)[0]
+                        position += 1
 
                     # grab the string
-                    string_value = data[:length]
+                    string_value = data[position:position + length]
                     values.append(str(string_value.decode(self.StringEncoding)))
-                    # remove the string from the packet
-                    data = data[length:]
+                    position += length
                 break
             else:
                 # handling special format for micropython for bools
@@ -1717,6 +2645,21 @@ class PLC(object):
         """
         Retrieve the data types of tags we have not read yet
         """
+        return self._run(self._get_unknown_types_requests(tags))
+
+    def _get_unknown_types_requests(self, tags):
+        """
+        Request generator for _get_unknown_types
+
+        The base tags are read with the multi service message, then any
+        that couldn't be read that way (a struct too large for the
+        packet, or an error) are read on their own like _initial_read
+        does.
+
+        returns {base tag: value} of the base tags read with the multi
+        service message.  Base tags with an index in them are left out,
+        they were read at index 0 so the value is not the tag's.
+        """
         unk_tags = []
         for t in tags:
 
@@ -1724,24 +2667,87 @@ class PLC(object):
                 tag_name, base_tag, index = parse_tag_name(t[0])
                 if len(t) == 3 and t[2] != None:
                     self.KnownTags[base_tag] = (t[2], 0)
-                else:
-                    unk_tags.append(t)
+                elif base_tag not in self.KnownTags:
+                    unk_tags.append(base_tag)
             else:
                 tag_name, base_tag, index = parse_tag_name(t)
                 if base_tag not in self.KnownTags:
-                    unk_tags.append(t)
+                    unk_tags.append(base_tag)
+
+        # each base tag is only read once
+        unk_tags = list(dict.fromkeys(unk_tags))
 
-        # get the unknown tags
-        if unk_tags:
-            for tag in unk_tags:
-                tag_name, base_tag, index = parse_tag_name(tag[0])
-                self._initial_read(tag_name, base_tag, tag[2])
+        values = {}
+        if len(unk_tags) > 1 and not self.Micro800:
+            replies = yield from self._multi_read_requests([[base_tag, 1, None] for base_tag in unk_tags])
+            for base_tag, value, status in replies:
+                if status == 0 and '[' not in base_tag:
+                    values[base_tag] = value
+
+        # get the tags the multi service message didn't
+        for base_tag in unk_tags:
+            if base_tag not in self.KnownTags:
+                yield from self._initial_read_requests(base_tag, base_tag, None)
+
+        return values
+
+    def _resolve_handle_requests(self, handle):
+        """
+        Request generator that gets the data type of a TagHandle's tag,
+        then builds the IOI, the requests and the formats the handle
+        needs.  Only atomic types that fit in a single packet get the
+        prebuilt requests.
+        """
+        resp = yield from self._initial_read_requests(handle.TagName, handle.BaseTag, handle.DataType)
+        if resp[2] != 0 and resp[2] != 6:
+            return resp
+
+        data_type = self.KnownTags[handle.BaseTag][0]
+        size, _, fmt = self.CIPTypes.get(data_type, self.CIPTypes[0x00])
+        handle.DataType = data_type
+        handle.Size = size
+        handle.Format = fmt
+        handle.IOI = self._build_ioi(handle.TagName, data_type)
+
+        if self._atomic_format(handle.TagName, data_type) is None:
+            return resp
+        if size * handle.Count + 64 > self.ConnectionSize:
+            return resp
+
+        read_format = '<{}{}'.format(handle.Count, fmt[1:])
+        handle.read_request = self._add_read_service(handle.IOI, handle.Count)
+        handle.read_format = read_format
+        handle.write_header = pack('<BB', 0x4D, len(handle.IOI) // 2) + handle.IOI
+        handle.write_header += pack('<BBH', data_type, 0x00, handle.Count)
+        handle.write_format = read_format
+        return resp
+
+    def _atomic_format(self, tag_name, data_type):
+        """
+        The struct format a value of the tag can be unpacked with
+        directly, or None when the value needs more work than that
+        (strings, structs, bits and BOOL arrays)
+        """
+        if data_type in (None, 0x00, 0xa0, 0xd0, 0xd3, 0xda) or data_type not in self.CIPTypes:
+            return None
+        if bit_of_word(tag_name):
+            return None
+        size, _, fmt = self.CIPTypes[data_type]
+        if calcsize(fmt) != size or (fmt == '<?' and is_micropython()):
+            return None
+        return fmt
 
     def _initial_read(self, tag, base_tag, data_type):
         """
         Store each unique tag read in a dict so that we can retrieve the
         data type or data length (for STRING) later
         """
+        return self._run(self._initial_read_requests(tag, base_tag, data_type))
+
+    def _initial_read_requests(self, tag, base_tag, data_type):
+        """
+        Request generator for _initial_read
+        """
         # if a tag already exists, return True
         if base_tag in self.KnownTags:
             return tag, None, 0
@@ -1753,7 +2759,7 @@ class PLC(object):
         request = self._add_read_service(ioi, 1)
 
         # send our tag read request
-        status, ret_data = self.conn.send(request)
+        status, ret_data = yield request
 
         # make sure it was successful
         if status == 0 or status == 6:
@@ -1808,66 +2814,84 @@ class PLC(object):
         else:
             bit_pos = int(tag.split('.')[-1])
 
-        ret = []
-        for v in value:
-            for i in range(0, bit_count):
-                ret.append(bit_value(v, i))
+        # pack the words back to bytes, so the bits can be expanded a
+        # byte at a time
+        word_format = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}[bit_count // 8]
+        mask = (1 << bit_count) - 1
+        data = pack('<{}{}'.format(len(value), word_format), *[v & mask for v in value])
 
-        return ret[bit_pos:bit_pos + count]
+        return bytes_to_bits(data, bit_pos, count)
 
-    def _parse_multi_read_response(self, data, tags):
+    def _parse_multi_read_response(self, data, tags, as_buffer=False):
         """
-        Extract the values from the multi-service message reply
+        Extract the values from the multi-service message reply.  The
+        reply segments are read where they are in the packet, without
+        slicing them out of it.  Arrays are parsed like the reply to
+        a single read, as_buffer applies to them.
         """
-        data = data[50:]
-        service_count = unpack_from("<H", data, 0)[0]
-        offsets = [unpack_from("<H", data, i*2+2)[0] for i in range(service_count)]
+        service_count = unpack_from("<H", data, 50)[0]
+        offsets = unpack_from("<{}H".format(service_count), data, 52)
 
         # define the start/end offsets so we can extract the values
-        segment_bounds = [offset for offset in offsets]
+        segment_bounds = [50 + offset for offset in offsets]
         segment_bounds.append(len(data))
 
-        # slice the data into each response segment
-        data_segments = []
-        for i in range(service_count):
-            data_segments.append(data[segment_bounds[i]:segment_bounds[i+1]])
-
         reply = []
-        for i, segment in enumerate(data_segments):
-            status = unpack_from("<B", segment, 2)[0]
+        for i in range(service_count):
+            start = segment_bounds[i]
+            status = unpack_from("<B", data, start + 2)[0]
             tag_name, base_tag, index  = parse_tag_name(tags[i][0])
             if status == 0:
-                data_type = unpack_from("<B", segment, 4)[0]
+                data_type = unpack_from("<B", data, start + 4)[0]
 
                 # get the number of byte the value occupies
                 if data_type == 0xa0:
-                    data_len = len(segment[8:])
+                    data_len = segment_bounds[i + 1] - start - 8
                 else:
-                    data_len = len(segment[6:])
+                    data_len = segment_bounds[i + 1] - start - 6
+
+                if tags[i][1] > 1:
+                    # arrays are parsed like the reply to a single read,
+                    # which starts with the data type
+                    values = self._parse_reply(tag_name, tags[i][1], data[start + 4:segment_bounds[i + 1]], as_buffer)
+                    if not len(values):
+                        value = None
+                    elif as_buffer and not isinstance(values, list):
+                        value = values
+                    elif len(values) == 1:
+                        value = values[0]
+                    else:
+                        value = values
+                    reply.append([tag_name, value, status])
+                    continue
 
                 self.KnownTags[base_tag] = (data_type, data_len)
                 # extract the value from the segment
                 if data_type == 0xa0:
-                    struct_id = unpack_from("<H", segment, 6)[0]
+                    struct_id = unpack_from("<H", data, start + 6)[0]
                     if struct_id == self.StringID:
-                        name_length = unpack_from("<I", segment, 8)[0]
-                        value = segment[12:12+name_length].decode(self.StringEncoding)
+                        name_length = unpack_from("<I", data, start + 8)[0]
+                        value = data[start + 12:start + 12 + name_length].decode(self.StringEncoding)
                     else:
-                        value = segment[12:12+data_len]
+                        decoder = self._struct_decoder(tag_name)
+                        if decoder is not None and data_len >= decoder.Size:
+                            value = decoder.decode(data, start + 8)
+                        else:
+                            value = data[start + 8:segment_bounds[i + 1]]
                 elif data_type == 0xd3 or bit_of_word(tag_name):
                     type_fmt = self.CIPTypes[data_type][2]
-                    value = unpack_from(type_fmt, segment, 6)[0]
+                    value = unpack_from(type_fmt, data, start + 6)[0]
                     value = self._words_to_bits(tag_name, [value], 1)[0]
                 elif data_type == 0xc1 and is_micropython():
                     type_fmt = "b"
-                    value = unpack_from(type_fmt, segment, 6)[0]
+                    value = unpack_from(type_fmt, data, start + 6)[0]
                     if value == 1:
                         value = True
                     else:
                         value = False
                 else:
                     type_fmt = self.CIPTypes[data_type][2]
-                    value = unpack_from(type_fmt, segment, 6)[0]
+                    value = unpack_from(type_fmt, data, start + 6)[0]
             else:
                 value = None
 
@@ -1965,6 +2989,86 @@ class PLC(object):
         pass
 
 
+def unpack_array(fmt, data, offset, count, array_format='list'):
+    """
+    Unpack count values of the struct format fmt from data, starting
+    at offset, all at once.
+
+    array_format picks what the values are returned in: 'list',
+    'array' for an array.array or 'numpy' for a (read only) numpy
+    array over data.  A single value is returned in a list, except
+    with 'buffer', which is an array.array no matter the count.
+    """
+    if count < 1 and array_format != 'buffer':
+        return []
+    if array_format == 'list' or (count < 2 and array_format != 'buffer'):
+        return list(unpack_from('<{}{}'.format(count, fmt[1:]), data, offset))
+
+    if array_format == 'array' or array_format == 'buffer':
+        values = array(fmt[1:].replace('?', 'B'))
+        if values.itemsize != calcsize(fmt):
+            # no array type code of this size on this platform
+            return list(unpack_from('<{}{}'.format(count, fmt[1:]), data, offset))
+        values.frombytes(data[offset:offset + count * values.itemsize])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values
+
+    if array_format == 'numpy':
+        import numpy
+        return numpy.frombuffer(data, dtype=fmt, count=count, offset=offset)
+
+    raise ValueError('Unknown array format {}'.format(array_format))
+
+
+def join_arrays(parts):
+    """
+    Join the values of reads split in several parts
+    """
+    if not parts:
+        return []
+    if len(parts) == 1:
+        return parts[0]
+
+    if isinstance(parts[0], BitArray):
+        return join_bits([part if isinstance(part, BitArray) else BitArray.from_int(bits_to_int(part), len(part))
+                          for part in parts])
+
+    if parts and not isinstance(parts[0], (list, array)):
+        import numpy
+        return numpy.concatenate(parts)
+
+    values = parts[0][:0]
+    for part in parts:
+        if isinstance(values, array) and not isinstance(part, array):
+            values.extend(array(values.typecode, part))
+        else:
+            values.extend(part)
+    return values
+
+
+def handle_args(tag):
+    """
+    Replace a TagHandle in a list of tags to read with the
+    [tag, count, data type] it stands for
+    """
+    if not isinstance(tag, TagHandle):
+        return tag
+    if tag.IOI is None:
+        return [tag.TagName, tag.Count, tag.DataType]
+    # the type is already in KnownTags, along with its size
+    return [tag.TagName, tag.Count, None]
+
+
+def handle_write_args(tag):
+    """
+    Replace a TagHandle in a list of tags to write with its tag name
+    """
+    if isinstance(tag[0], TagHandle):
+        return (tag[0].TagName,) + tuple(tag[1:])
+    return tag
+
+
 def bit_of_word_state(tag, value):
     """
     Find the array/bit element at the end of a tag
@@ -1972,13 +3076,11 @@ def bit_of_word_state(tag, value):
     value provided
     ex: (bit 4 of the number 30313 is False)
     """
-    bit_pattern = r'\d+$'
-    array_pattern = r'\[\s*(0|[1-9][0-9]*)(\s*,\s*(0|[1-9][0-9]*))*\s*\]$'
-    try:
-        index = re.search(array_pattern, tag).group(0)
-        index = index[1:-1]
-    except Exception:
-        index = re.search(bit_pattern, tag).group(0)
+    path = parse_tag_path(tag)
+    if path.Indexed:
+        index = path.Index
+    else:
+        index = int(tag[len(tag.rstrip(_DIGITS)):])
 
     index = int(index) % 32
 
@@ -2007,26 +3109,117 @@ def parse_tag_name(tag):
     ex: MyTag.Name[42] returns:
     MyTag.Name[42], MyTag.Name, 42
     """
-    bit_end_pattern = r'\.\d+$'
-    array_pattern = r'\[\s*(0|[1-9][0-9]*)(\s*,\s*(0|[1-9][0-9]*))*\s*\]$'
-
-    # get the array index
-    try:
-        index = re.search(array_pattern, tag).group(0)
-        index = index[1:-1]
-        if ',' in index:
-            index = index.split(',')
-            index = list(map(int, index))
-        else:
-            index = int(index)
-    except Exception:
-        index = 0
+    path = parse_tag_path(tag)
+    return tag, path.BaseTag, path.Index
+
+
+_DIGITS = '0123456789'
+_tag_paths = {}
+
+
+class TagPath(object):
+    """
+    A tag name split into its parts
+
+    Segments: (name, index) for each symbolic segment, index is None when
+              the segment isn't an array, an int, or a list of ints for
+              multi-dim arrays.  A bit number isn't a segment.
+    Bit:      the bit number when the tag ends with one (MyDint.5)
+    BaseTag:  the tag name without its trailing bit and array index
+    Index:    the trailing array index, 0 when there isn't one
+    Indexed:  True when the tag ends with an array index
+    """
+    __slots__ = ('Tag', 'Segments', 'Bit', 'BaseTag', 'Index', 'Indexed')
+
+    def __init__(self, tag):
+
+        self.Tag = tag
+        self.Segments = []
+        self.Bit = None
+        self.Index = 0
+        self.Indexed = False
+
+        parts = tag.split('.')
+        for part in parts:
+            if _is_number(part):
+                continue
+            if part.endswith(']'):
+                name, index = _split_index(part)
+                if index is None:
+                    # not a valid index, keep the brackets in the name
+                    self.Segments.append((part, 0))
+                else:
+                    self.Segments.append((name, index))
+            else:
+                self.Segments.append((part, None))
+
+        base_tag = tag
+        last = parts[-1]
+        if _is_number(last):
+            self.Bit = int(last)
+            if len(parts) > 1:
+                base_tag = tag[:-len(last) - 1]
+        elif last.endswith(']'):
+            _, index = _split_index(last)
+            if index is not None:
+                self.Index = index
+                self.Indexed = True
+
+        if base_tag.endswith(']'):
+            name, index = _split_index(base_tag)
+            if index is not None:
+                base_tag = name
+        self.BaseTag = base_tag
 
-    # get the base tag name
-    base_tag = re.sub(bit_end_pattern, '', tag)
-    base_tag = re.sub(array_pattern, '', base_tag)
+    def __repr__(self):
 
-    return tag, base_tag, index
+        return 'TagPath(Tag={}, Segments={}, Bit={})'.format(self.Tag, self.Segments, self.Bit)
+
+
+def parse_tag_path(tag):
+    """
+    Split a tag name into a TagPath, in one pass over its segments.
+    The same tag names are parsed over and over, so the paths are kept.
+
+    ex: Program:Main.MyUDT[2,3].Status.5 returns a TagPath with the
+    segments [('Program:Main', None), ('MyUDT', [2, 3]), ('Status', None)]
+    and bit 5
+    """
+    path = _tag_paths.get(tag)
+    if path is None:
+        if len(_tag_paths) >= 10000:
+            _tag_paths.clear()
+        path = _tag_paths[tag] = TagPath(tag)
+    return path
+
+
+def _is_number(text):
+    """
+    Test if the text is only the digits 0-9
+    """
+    return text != '' and not text.strip(_DIGITS)
+
+
+def _split_index(text):
+    """
+    Split the array index off the end of a segment, MyTag[1,2] returns
+    MyTag, [1, 2].  The index is None when it isn't valid, indexes can't
+    have leading zeros.
+    """
+    i = text.rfind('[')
+    if i < 0:
+        return text, None
+
+    index = []
+    for value in text[i + 1:-1].split(','):
+        value = value.strip()
+        if not _is_number(value) or (value[0] == '0' and len(value) > 1):
+            return text, None
+        index.append(int(value))
+
+    if len(index) == 1:
+        return text[:i], index[0]
+    return text[:i], index
 
 
 def bin_to_int(bits, bpw):
@@ -2036,9 +3229,7 @@ def bin_to_int(bits, bpw):
     sign_limit = 2 ** (bpw - 1) - 1
     conv = (2 ** bpw)
 
-    value = 0
-    for bit in reversed(bits):
-        value = (value << 1) | bit
+    value = bits_to_int(bits)
 
     if value > sign_limit:
         value -= conv
@@ -2055,16 +3246,13 @@ def mod_write_masks(tag, values, bpw):
     make the mask lists, then break them up into 4 byte chunks.  Lastly, we'll
     convert them to values.
     """
-    bit_pattern = r'\.\d+$'
-    array_pattern = r'\[\s*(0|[1-9][0-9]*)(\s*,\s*(0|[1-9][0-9]*))*\s*\]$'
-
-    try:
+    path = parse_tag_path(tag)
+    if path.Bit is not None:
         # A bit of a word
-        index = int(re.search(bit_pattern, tag).group(0)[1:])
-    except Exception:
+        index = path.Bit
+    else:
         # boolean arrays
-        index = re.search(array_pattern, tag).group(0)
-        index = int(index[1:-1])
+        index = int(path.Index)
 
     # figure out how many words our bits will occupy
     start_bit = index % bpw
@@ -2072,27 +3260,33 @@ def mod_write_masks(tag, values, bpw):
     word_count = ((start_bit % bpw) + bit_count) / bpw
     word_count = int(math.ceil(word_count))
 
-    # create template high/low mask lists.
-    mask_high = [0 for _ in range(word_count * bpw)]
-    mask_low = [1 for _ in range(word_count * bpw)]
-
-    # map our values onto our masks
-    mask_high[start_bit:start_bit + len(values)] = values
-    mask_low[start_bit:start_bit + len(values)] = values
+    # build the high/low masks for all the words as one integer each,
+    # the high mask has the values and 0 elsewhere, the low mask the
+    # values and 1 elsewhere
+    bits = bits_to_int(values) << start_bit
+    field = ((1 << bit_count) - 1) << start_bit
+    mask_high = bits
+    mask_low = ((1 << (word_count * bpw)) - 1) & ~field | bits
 
-    # split up our lists into chunks of n bytes
-    segments_high = [mask_high[x:x + bpw] for x in range(0, len(mask_high), bpw)]
-    segments_low = [mask_low[x:x + bpw] for x in range(0, len(mask_low), bpw)]
-
-    # convert our finalized lists of masks to values to be written
-    values_high = [bin_to_int(seg, bpw) for seg in segments_high]
-    values_low = [bin_to_int(seg, bpw) for seg in segments_low]
+    # split the masks into words to be written
+    word_mask = (1 << bpw) - 1
+    sign_limit = 2 ** (bpw - 1) - 1
+    values_high = []
+    values_low = []
+    for w in range(word_count):
+        for mask, words in ((mask_high, values_high), (mask_low, values_low)):
+            word = (mask >> (w * bpw)) & word_mask
+            if word > sign_limit:
+                word -= 1 << bpw
+            words.append(word)
 
     tags = [tag]
     for _ in range(word_count - 1):
         index += bpw
-        new_index = "[{}]".format(index)
-        new_tag = re.sub(array_pattern, new_index, tag)
+        if path.Indexed:
+            new_tag = "{}[{}]".format(tag[:tag.rfind('[')], index)
+        else:
+            new_tag = tag
         tags.append(new_tag)
 
     return values_high, values_low, tags
@@ -2103,11 +3297,7 @@ def bit_of_word(tag):
     Test if the user is trying to write to a bit of a word
     ex. Tag.1 returns True (Tag = DINT)
     """
-    s = tag.split('.')
-    if s[len(s) - 1].isdigit():
-        return True
-    else:
-        return False
+    return parse_tag_path(tag).Bit is not None
 
 
 def bit_value(value, bit_no):
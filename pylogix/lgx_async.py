@@ -0,0 +1,679 @@
+"""
+   Copyright 2022 Dustin Roeder (dmroeder@gmail.com)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import asyncio
+
+from struct import unpack_from
+
+from pylogix.eip import PLC, handle_args, handle_write_args
+from pylogix.lgx_comm import Connection
+from pylogix.lgx_device import Device
+from pylogix.lgx_response import Response
+from pylogix.lgx_scheduler import Scheduler
+from pylogix.lgx_subscribe import Subscription
+from pylogix.lgx_tag import TagHandle
+
+
+class AsyncConnection(Connection):
+    """
+    asyncio version of Connection.  Packets are built with the same
+    methods as Connection, only the socket I/O is different.  Each
+    request/reply exchange holds a lock, so any number of tasks can
+    share one connection.
+    """
+
+    def __init__(self, parent):
+        super(AsyncConnection, self).__init__(parent)
+        self._reader = None
+        self._writer = None
+        self._lock = None
+
+    async def connect(self, connected=True):
+        """
+        Connect to the PLC
+        """
+        async with self._get_lock():
+            return await self._connect(connected)
+
+    def _new_socket(self):
+        """
+        The streams are opened when connecting, there's no blocking socket
+        """
+        return None
+
+    async def send(self, request, connected=True, slot=None):
+        """
+        Send the request to the PLC
+        Return the status and data
+        """
+        async with self._get_lock():
+            # build the frame while holding the lock so the
+            # sequence count goes out in order
+            eip_header = self._build_frame(request, connected, slot)
+            return await self._get_bytes(eip_header, connected)
+
+    async def send_many(self, requests, window=1):
+        """
+        Send a list of connected requests, keeping up to window of them
+        in flight at once.  Replies are matched to their request by the
+        sequence count, the list returned is in the same order as the
+        requests.
+        """
+        async with self._get_lock():
+            replies = [(1, None)] * len(requests)
+            pending = {}
+            sent = 0
+            received = 0
+            try:
+                while received < len(requests):
+                    while sent < len(requests) and len(pending) < max(window, 1):
+                        frame = self._build_eip_header(requests[sent])
+                        pending[self._sequence(frame)] = sent
+                        self._writer.write(frame)
+                        sent += 1
+                    await self._writer.drain()
+
+                    ret_data = await asyncio.wait_for(self.receive_data(), self.parent.SocketTimeout)
+                    index = pending.pop(self._sequence(ret_data), None)
+                    if index is not None:
+                        replies[index] = self._reply_status(ret_data, True), ret_data
+                        received += 1
+            except (AttributeError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                self.SocketConnected = False
+
+            return replies
+
+    async def close(self):
+        """
+        Close the connection
+        """
+        async with self._get_lock():
+            await self._close_connection()
+
+    def _get_lock(self):
+        """
+        The lock is created on first use so that it belongs to the
+        running event loop
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _connect(self, connected):
+        """
+        Open a connection to the PLC.
+        """
+        if self.SocketConnected:
+            if connected != self._connected:
+                # connection type changed, need to close, so we can reconnect
+                await self._close_connection()
+            else:
+                return [True, 'Success']
+
+        await self._close_socket()
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.parent.IPAddress, self.parent.Port),
+                self.parent.SocketTimeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.SocketConnected = False
+            self._sequence_counter = 1
+            return [False, e]
+
+        # register the session
+        ret_data = await self._exchange(self._build_register_session())
+        if ret_data:
+            self._session_handle = unpack_from('<I', ret_data, 4)[0]
+            self._registered = True
+        else:
+            self.SocketConnected = False
+            return [False, 'Register session failed']
+
+        if connected:
+            if self.ConnectionSize is not None:
+                ret = await self._forward_open()
+            else:
+                # try a large forward open by default
+                self.ConnectionSize = 4002
+                ret = await self._forward_open()
+
+                # if large forward open fails, try a normal forward open
+                if not ret[0]:
+                    self.ConnectionSize = 504
+                    ret = await self._forward_open()
+
+            if ret[0] and self.parent.TagCache is not None:
+                await self._run_unlocked(self.parent._tag_cache_requests())
+
+            return ret
+
+        self.SocketConnected = True
+        return [self.SocketConnected, 'Success']
+
+    async def _run_unlocked(self, requests):
+        """
+        Drive a request generator while the lock is already held
+        """
+        try:
+            request = next(requests)
+            while True:
+                eip_header = self._build_frame(request, True)
+                request = requests.send(await self._get_bytes(eip_header, True))
+        except StopIteration as e:
+            return e.value
+
+    async def _forward_open(self):
+        """
+        ForwardOpen connection.
+        """
+        ret_data = await self._exchange(self._build_forward_open_packet())
+        if not ret_data:
+            self.SocketConnected = False
+            return [False, "Forward open failed"]
+
+        sts = unpack_from('<b', ret_data, 42)[0]
+        if not sts:
+            self._ot_connection_id = unpack_from('<I', ret_data, 44)[0]
+            self._connected = True
+        else:
+            self.SocketConnected = False
+            return [False, 'Forward open failed']
+
+        self.SocketConnected = True
+        return [self.SocketConnected, 'Success']
+
+    async def _close_connection(self):
+        """
+        Close the connection to the PLC (forward close, unregister session)
+        """
+        self.SocketConnected = False
+        if self._writer is None:
+            return
+        try:
+            if self._connected:
+                await self._exchange(self._build_forward_close_packet())
+                self._connected = False
+            if self._registered:
+                self._writer.write(self._build_unregister_session())
+                await self._writer.drain()
+                self._registered = False
+        except (Exception,):
+            pass
+        await self._close_socket()
+
+    async def _close_socket(self):
+        """
+        Close the stream, ignoring errors from a connection that has
+        already gone away
+        """
+        writer = self._writer
+        self._reader = None
+        self._writer = None
+        self._connected = False
+        self._registered = False
+        if writer is None:
+            return
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except (Exception,):
+            pass
+
+    async def _get_bytes(self, data, connected):
+        """
+        Sends data and gets the return data
+        """
+        ret_data = await self._exchange(data)
+        if ret_data:
+            return self._reply_status(ret_data, connected), ret_data
+        else:
+            self.SocketConnected = False
+            return 1, None
+
+    async def _exchange(self, data):
+        """
+        Send a packet and wait for the complete reply.  The encapsulation
+        header carries the payload length, so read the 24 byte header
+        first, then exactly the rest of the packet.
+        """
+        if self._writer is None:
+            return None
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+            return await asyncio.wait_for(self.receive_data(), self.parent.SocketTimeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None
+
+    async def receive_data(self):
+        """
+        Read one encapsulated packet from the stream
+        """
+        header = await self._reader.readexactly(24)
+        payload_len = unpack_from('<H', header, 2)[0]
+        return header + await self._reader.readexactly(payload_len)
+
+    async def listen(self, ip_address, callback, port):
+        """
+        Listen for CIP Data Table Write (0x4d) messages from the PLC.  The
+        listener is a blocking Connection of its own, run in a worker
+        thread, so the session of this connection isn't disturbed.
+        """
+        listener = Connection(self.parent)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, listener.listen, ip_address, callback, port)
+
+    async def discover(self, parse_procedural_parameter):
+        """
+        Discover devices on the network.  The broadcast uses blocking UDP
+        sockets, it's run in a worker thread.
+        """
+        discover = super(AsyncConnection, self).discover
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, discover, parse_procedural_parameter)
+
+
+class AsyncSubscription(Subscription):
+    """
+    asyncio version of Subscription, returned by AsyncPLC.Subscribe().
+    poll() and run() are coroutines and changes() is an async generator,
+    the changes are worked out the same way.
+
+        sub = comm.Subscribe(['Tag1', ('Speed', 0.5)], period=0.5)
+        async for change in sub.changes():
+            print(change.TagName, change.Value)
+    """
+
+    async def poll(self):
+        """
+        Read the tags once
+
+        returns a list of Response class (.TagName, .Value, .Status) of
+        the tags that changed
+        """
+        return self._report(await self.Plan.execute())
+
+    async def changes(self):
+        """
+        Async generator that polls the tags every Period, on a fixed time
+        grid, and yields each change
+        """
+        self.Scheduler = Scheduler(self.Period)
+        self.running = True
+        while self.running:
+            self.Scheduler.advance()
+            await asyncio.sleep(self.Scheduler.remaining())
+            self.Scheduler.start()
+            for change in await self.poll():
+                yield change
+
+    async def run(self):
+        """
+        Poll the tags every Period until stop() is called, passing the
+        changes to the callback
+        """
+        async for _ in self.changes():
+            pass
+
+
+class AsyncPLC(PLC):
+    """
+    asyncio client for Logix controllers
+
+    Every method that talks to the controller works like it does on
+    PLC, but is a coroutine.  The requests are built and the replies
+    parsed by the same code PLC uses, so the results are identical.
+    Discover and ReceiveMessage use blocking sockets, they are run in a
+    worker thread.
+
+        async with AsyncPLC('192.168.1.9') as comm:
+            ret = await comm.Read('MyTag')
+
+    Several AsyncPLC instances can be awaited together with
+    asyncio.gather() to talk to many controllers from a single thread.
+    """
+    __slots__ = ()
+
+    connection_class = AsyncConnection
+
+    def __enter__(self):
+        raise TypeError('Use "async with" with AsyncPLC')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """
+        Clean up on exit
+        """
+        await self.Close()
+
+    async def Read(self, tag, count=1, datatype=None, as_buffer=False):
+        """
+        We have two options for reading depending on
+        the arguments, read a single tag, or read an array
+
+        returns Response class (.TagName, .Value, .Status)
+        """
+        if isinstance(tag, TagHandle):
+            return await self._read_handle(tag, as_buffer)
+        if isinstance(tag, (list, tuple)):
+            tag = [handle_args(t) for t in tag]
+            if len(tag) == 1:
+                if isinstance(tag[0], (list, tuple)):
+                    return [await self._read_tag(*tag[0], as_buffer=as_buffer)]
+                else:
+                    return [await self._read_tag(tag[0], count, datatype, as_buffer)]
+            if self.Micro800:
+                if isinstance(tag[0], (list, tuple)):
+                    return [await self._read_tag(*t, as_buffer=as_buffer) for t in tag]
+                else:
+                    return [await self._read_tag(t, count, datatype, as_buffer) for t in tag]
+            else:
+                return await self._batch_read(tag, as_buffer)
+        else:
+            return await self._read_tag(tag, count, datatype, as_buffer)
+
+    async def Write(self, tag, value=None, datatype=None):
+        """
+        We have two options for writing depending on
+        the arguments, write a single tag, or write an array
+
+        returns Response class (.TagName, .Value, .Status)
+        """
+        if isinstance(tag, (list, tuple)):
+            tag = [handle_write_args(t) for t in tag]
+            if len(tag) == 1:
+                return [await self._write_tag(*tag[0])]
+            else:
+                return await self._batch_write(tag)
+        else:
+            if value is None:
+                raise TypeError('You must provide a value to write')
+            elif isinstance(tag, TagHandle):
+                return await self._write_handle(tag, value)
+            else:
+                return await self._write_tag(tag, value, datatype)
+
+    async def GetTagList(self, allTags=True):
+        """
+        Retrieves the tag list from the PLC
+        Optional parameter allTags set to True
+        If is set to False, it will return only controller
+        otherwise controller tags and program tags.
+
+        The pages of the program tag lists are requested for every
+        program at once, with up to RequestWindow requests in flight.
+        RequestWindow is 1 by default, which gets them one at a time.
+
+        returns Response class (.TagName, .Value, .Status)
+        """
+        if self.TagCache is not None:
+            # the cache is loaded when the connection is opened
+            conn = await self.conn.connect()
+            if conn[0] and self.TagCache.get_tag_list(allTags) is not None:
+                self.TagList = self.TagCache.get_tag_list(allTags)
+                return Response(None, self.TagList, 0)
+
+        self.UDT = {}
+        self.KnownTags = {}
+        self.TagList = []
+        self.ProgramNames = []
+        tag_list = await self._get_tag_list(allTags)
+        updated_list = await self._run(self._get_udt_requests(tag_list.Value)) if tag_list.Value else None
+        if self.TagCache is not None and updated_list is not None:
+            self.TagCache.set_tag_list(allTags, updated_list)
+        return Response(None, updated_list, tag_list.Status)
+
+    async def GetProgramTagList(self, programName):
+        """
+        Retrieves a program tag list from the PLC
+        programName = "Program:ExampleProgram"
+
+        returns Response class (.TagName, .Value, .Status)
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(programName, None, conn[1])
+
+        # If ProgramNames is empty then _getTagList hasn't been called
+        if not self.ProgramNames:
+            await self._run(self._get_tag_list_requests(False))
+
+        if programName in self.ProgramNames:
+            program_tags = await self._run(self._get_program_tag_list_requests(programName))
+            status = program_tags.Status
+            program_tags = await self._run(self._get_udt_requests(program_tags.Value))
+            return Response(None, program_tags, status)
+        else:
+            return Response(programName, None, 'Program not found, please check name!')
+
+    async def GetProgramsList(self):
+        """
+        Retrieves a program names list from the PLC
+
+        returns Response class (.TagName, .Value, .Status)
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(None, None, conn[1])
+
+        if not self.ProgramNames:
+            await self._run(self._get_tag_list_requests(False))
+        if self.ProgramNames:
+            status = 0
+        else:
+            status = "Unable to retrieve programs list"
+        return Response(None, self.ProgramNames, status)
+
+    async def Close(self):
+        """
+        Close the connection to the PLC
+        """
+        if self.TagCache is not None:
+            self.TagCache.save(self)
+        return await self.conn.close()
+
+    def Subscribe(self, tags, period=1.0, deadband=0, callback=None):
+        """
+        Poll a list of tags and report only the values that changed, see
+        PLC.Subscribe
+
+        returns AsyncSubscription
+        """
+        return AsyncSubscription(self, tags, period, deadband, callback)
+
+    async def Discover(self):
+        """
+        Query all the EIP devices on the network
+
+        returns Response class (.TagName, .Value, .Status)
+        """
+        devices = await self.conn.discover(parse_procedural_parameter=Device.parse)
+        return Response(None, devices, 0)
+
+    async def ReceiveMessage(self, ip_address, callback, port=44818):
+        """
+        Listen for CIP Data Table Write messages, the callback is called
+        on the event loop with the Response of each message
+        """
+        loop = asyncio.get_event_loop()
+        self.callback = lambda response: loop.call_soon_threadsafe(callback, response)
+        return await self._receive_message(ip_address, port)
+
+    async def _run(self, requests):
+        """
+        Drive a request generator over the asyncio connection
+        """
+        try:
+            request = next(requests)
+            while True:
+                if isinstance(request, list):
+                    reply = await self.conn.send_many(request, self.RequestWindow)
+                elif isinstance(request, tuple):
+                    reply = await self.conn.send(*request)
+                else:
+                    reply = await self.conn.send(request)
+                request = requests.send(reply)
+        except StopIteration as e:
+            return e.value
+
+    async def _read_tag(self, tag_name, elements=1, data_type=None, as_buffer=False):
+        """
+        Processes the read request
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(tag_name, None, conn[1])
+
+        return await self._run(self._read_tag_requests(tag_name, elements, data_type, as_buffer))
+
+    async def _read_handle(self, handle, as_buffer=False):
+        """
+        Processes the read request for a TagHandle
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(handle.TagName, None, conn[1])
+
+        return await self._run(self._read_handle_requests(handle, as_buffer))
+
+    async def _batch_read(self, tags, as_buffer=False):
+        """
+        Read tags using multi-service messaging
+        """
+        if self.Micro800:
+            return Response(tags, None, 8)
+
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return [Response(t, None, conn[1]) for t in tags]
+
+        return await self._run(self._batch_read_requests(tags, as_buffer))
+
+    async def _read_plan(self, plan):
+        """
+        Processes the read request for a ReadPlan
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return [Response(t[0], None, conn[1]) for t in plan.Tags]
+
+        return await self._run(self._read_plan_requests(plan))
+
+    async def _write_tag(self, tag_name, value, data_type=None):
+        """
+        Processes the write request
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(tag_name, None, conn[1])
+
+        return await self._run(self._write_tag_requests(tag_name, value, data_type))
+
+    async def _write_handle(self, handle, value):
+        """
+        Processes the write request for a TagHandle
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(handle.TagName, None, conn[1])
+
+        return await self._run(self._write_handle_requests(handle, value))
+
+    async def _batch_write(self, tags):
+        """
+        Processes the multiple write request
+        """
+        if self.Micro800:
+            return Response(tags, None, 8)
+
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return [Response(t[0], None, conn[1]) for t in tags]
+
+        return await self._run(self._batch_write_requests(tags))
+
+    async def _get_tag_list(self, all_tags):
+        """
+        Requests the controller tag list and returns a list of Tag type
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(None, None, conn[1])
+
+        return await self._run(self._get_tag_list_requests(all_tags))
+
+    async def _get_plc_time(self, raw=False):
+        """
+        Requests the PLC clock time
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(None, None, conn[1])
+
+        return await self._run(self._get_plc_time_requests(raw))
+
+    async def _set_plc_time(self, dst, set_timezone=False, timezone=None):
+        """
+        Sets the PLC clock time (and optionally the time zone)
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(None, None, conn[1])
+
+        return await self._run(self._set_plc_time_requests(dst, set_timezone, timezone))
+
+    async def _set_plc_gateway(self, gateway):
+        """
+        Sets the PLC's default gateway
+        """
+        conn = await self.conn.connect()
+        if not conn[0]:
+            return Response(None, None, conn[1])
+
+        return await self._run(self._set_plc_gateway_requests(gateway))
+
+    async def _get_module_properties(self, slot):
+        """
+        Request the properties of a module in a particular
+        slot.  Returns Device()
+        """
+        conn = await self.conn.connect(False)
+        if not conn[0]:
+            return Response(None, Device(), conn[1])
+
+        return await self._run(self._get_properties_requests(slot))
+
+    async def _get_device_properties(self):
+        """
+        Request the properties of a device at the
+        specified IP address.  Returns Device()
+        """
+        conn = await self.conn.connect(False)
+        if not conn[0]:
+            return Response(None, Device(), conn[1])
+
+        return await self._run(self._get_properties_requests(None))
+
+    async def _message(self, cip_service, cip_class, cip_instance, cip_attribute, data):
+        conn = await self.conn.connect(False)
+        if not conn[0]:
+            return Response(None, None, conn[1])
+
+        return await self._run(self._message_requests(cip_service, cip_class, cip_instance, cip_attribute, data))
@@ -0,0 +1,133 @@
+"""
+   Copyright 2022 Dustin Roeder (dmroeder@gmail.com)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+# the bits of every byte value, lowest bit first
+_BYTE_BITS = [tuple(bool(b >> i & 1) for i in range(8)) for b in range(256)]
+
+
+def bytes_to_bits(data, start, count):
+    """
+    Expand count bits of data, starting at bit start, to a list of
+    True/False.  Bits are numbered from the lowest bit of the first
+    byte, which is how the bits of little endian words (bits of a
+    DINT, BOOL arrays) are numbered.
+    """
+    first = start // 8
+    last = (start + count + 7) // 8
+    bits = []
+    for b in data[first:last]:
+        bits.extend(_BYTE_BITS[b])
+    offset = start - first * 8
+    return bits[offset:offset + count]
+
+
+def bytes_to_int(data, start, count):
+    """
+    count bits of data, starting at bit start, as an integer, the
+    first bit being the lowest bit of the integer
+    """
+    first = start // 8
+    last = (start + count + 7) // 8
+    value = int.from_bytes(bytes(data[first:last]), 'little') >> (start - first * 8)
+    return value & ((1 << count) - 1)
+
+
+def bits_to_int(bits):
+    """
+    Convert a list of True/False (or 1/0) to an integer, the first
+    bit being the lowest bit of the integer
+    """
+    if isinstance(bits, BitArray):
+        return int.from_bytes(bits.Bytes, 'little')
+    if not bits:
+        return 0
+    return int(''.join(['1' if bit else '0' for bit in reversed(bits)]), 2)
+
+
+class BitArray(object):
+    """
+    A compact, read only, array of bits returned for BOOL arrays and
+    bits of words when PLC.BoolFormat is 'packed'.  The bits are kept
+    packed in Bytes, the first bit read is the lowest bit of the first
+    byte.  Indexing and iterating return True/False like the list
+    would.
+    """
+    __slots__ = ('Bytes', 'Count')
+
+    def __init__(self, data, count):
+        """
+        data: the packed bits
+        count: number of bits
+        """
+        self.Bytes = data
+        self.Count = count
+
+    @classmethod
+    def from_int(cls, value, count):
+
+        return cls(value.to_bytes((count + 7) // 8, 'little'), count)
+
+    def __len__(self):
+
+        return self.Count
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.Count))]
+        if index < 0:
+            index += self.Count
+        if not 0 <= index < self.Count:
+            raise IndexError('BitArray index out of range')
+        return bool(self.Bytes[index >> 3] >> (index & 7) & 1)
+
+    def __iter__(self):
+
+        return iter(bytes_to_bits(self.Bytes, 0, self.Count))
+
+    def __eq__(self, other):
+
+        if isinstance(other, BitArray):
+            return self.Count == other.Count and self.Bytes == other.Bytes
+        return list(self) == other
+
+    def __ne__(self, other):
+
+        return not self == other
+
+    def __int__(self):
+
+        return int.from_bytes(self.Bytes, 'little')
+
+    def __repr__(self):
+
+        return 'BitArray({})'.format(list(self))
+
+    def __str__(self):
+
+        return str(list(self))
+
+
+def join_bits(parts):
+    """
+    Join BitArrays into one
+    """
+    value = 0
+    count = 0
+    for part in parts:
+        value |= int(part) << count
+        count += len(part)
+    return BitArray.from_int(value, count)
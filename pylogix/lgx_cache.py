@@ -0,0 +1,209 @@
+"""
+   Copyright 2022 Dustin Roeder (dmroeder@gmail.com)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import json
+import os
+
+from binascii import hexlify, unhexlify
+
+from pylogix.lgx_tag import Tag, UDT
+
+
+class TagCache(object):
+    """
+    Keeps what pylogix learns about a controller's tags (the data type of
+    each tag read, the tag list and the UDT definitions) in a file, so the
+    next process that talks to the same controller starts with it instead
+    of asking the controller again.
+
+    There is one file per controller in the cache directory, named after
+    the controller's serial number.  Each file holds the fingerprint the
+    controller reported when it was written, when the project is changed
+    (tags or types added, removed or edited) the fingerprint changes and
+    the file is thrown away.
+
+        comm = PLC('192.168.1.9')
+        comm.TagCache = TagCache('/var/cache/pylogix')
+    """
+
+    def __init__(self, path):
+        """
+        path: directory the cache files are kept in
+        """
+        self.Path = path
+        self.Serial = None
+        self.Fingerprint = None
+
+        self._all_tags = None
+        self._tag_list = None
+        self._saved = None
+
+    def __repr__(self):
+
+        return 'TagCache(Path={}, Serial={}, Fingerprint={})'.format(self.Path, self.Serial, self.Fingerprint)
+
+    @property
+    def FileName(self):
+        """
+        File the current controller's tags are cached in
+        """
+        if self.Serial is None:
+            return None
+        return os.path.join(self.Path, '{:08x}.json'.format(self.Serial))
+
+    def get_tag_list(self, all_tags):
+        """
+        The cached GetTagList result, or None when the tag list hasn't
+        been retrieved with the same allTags option
+        """
+        if self._tag_list is not None and self._all_tags == all_tags:
+            return self._tag_list
+        return None
+
+    def set_tag_list(self, all_tags, tag_list):
+        """
+        Remember a GetTagList result
+        """
+        self._all_tags = all_tags
+        self._tag_list = tag_list
+
+    def load(self, plc, serial, fingerprint):
+        """
+        Called each time a session is opened with the controller's serial
+        number and fingerprint.  Restores the cached tags into the PLC,
+        or drops what the PLC already knows if it is now talking to a
+        different controller, or the project was changed.
+        """
+        if serial == self.Serial and fingerprint == self.Fingerprint:
+            return
+
+        if self.Serial is not None:
+            # what was learned is for another controller or project
+            plc.KnownTags = {}
+            plc.UDT = {}
+            plc.UDTByName = {}
+            plc.TagList = []
+            plc.ProgramNames = []
+            self._all_tags = None
+            self._tag_list = None
+
+        self.Serial = serial
+        self.Fingerprint = fingerprint
+        self._saved = None
+
+        try:
+            with open(self.FileName) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if cache.get('Fingerprint') != fingerprint:
+            # the project has changed since the file was written
+            try:
+                os.remove(self.FileName)
+            except OSError:
+                pass
+            return
+
+        self._restore(plc, cache)
+        self._saved = self._dumps(plc)
+
+    def save(self, plc):
+        """
+        Write what the PLC knows about the controller's tags to the
+        cache file, if it changed
+        """
+        if self.Serial is None:
+            return
+
+        data = self._dumps(plc)
+        if data == self._saved:
+            return
+
+        try:
+            if not os.path.isdir(self.Path):
+                os.makedirs(self.Path)
+            temp = self.FileName + '.tmp'
+            with open(temp, 'w') as f:
+                f.write(data)
+            os.replace(temp, self.FileName)
+        except OSError:
+            return
+        self._saved = data
+
+    def _dumps(self, plc):
+        """
+        Serialize the PLC's tag information
+        """
+        cache = {'Serial': self.Serial,
+                 'Fingerprint': self.Fingerprint,
+                 'KnownTags': plc.KnownTags,
+                 'ProgramNames': plc.ProgramNames,
+                 'UDT': [{'Type': udt.Type,
+                          'Name': udt.Name,
+                          'Size': udt.Size,
+                          'Fields': [self._tag_to_dict(f) for f in udt.Fields]}
+                         for udt in plc.UDT.values()],
+                 'AllTags': self._all_tags,
+                 'TagList': None}
+        if self._tag_list is not None:
+            cache['TagList'] = [self._tag_to_dict(t) for t in self._tag_list]
+
+        return json.dumps(cache, sort_keys=True)
+
+    def _restore(self, plc, cache):
+        """
+        Put the cached tag information back in the PLC.  Anything the PLC
+        learned in this process is kept.
+        """
+        known_tags = dict((k, tuple(v)) for k, v in cache['KnownTags'].items())
+        known_tags.update(plc.KnownTags)
+        plc.KnownTags = known_tags
+
+        if not plc.ProgramNames:
+            plc.ProgramNames = cache['ProgramNames']
+
+        if not plc.UDT:
+            for u in cache['UDT']:
+                udt = UDT()
+                udt.Type = u['Type']
+                udt.Name = u['Name']
+                udt.Size = u.get('Size', 0)
+                for f in u['Fields']:
+                    field = self._dict_to_tag(f)
+                    field.UDT = udt
+                    udt.Fields.append(field)
+                    udt.FieldsByName[field.TagName] = field
+                plc.UDT[udt.Type] = udt
+                plc.UDTByName[udt.Name] = udt
+
+        if cache['TagList'] is not None:
+            self._all_tags = cache['AllTags']
+            self._tag_list = [self._dict_to_tag(t) for t in cache['TagList']]
+
+    def _tag_to_dict(self, tag):
+
+        d = dict((k, v) for k, v in tag.__dict__.items() if k != 'UDT')
+        if d['Bytes'] is not None:
+            d['Bytes'] = hexlify(d['Bytes']).decode('ascii')
+        return d
+
+    def _dict_to_tag(self, d):
+
+        tag = Tag()
+        tag.__dict__.update(d)
+        if tag.Bytes is not None:
+            tag.Bytes = unhexlify(tag.Bytes)
+        return tag
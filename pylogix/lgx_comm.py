@@ -31,10 +31,10 @@ class Connection(object):
         self.parent = parent
 
         self.ConnectionSize = None  # Default to try Large, then Small Fwd Open.
-        self.Socket = socket.socket()
+        self.Socket = self._new_socket()
         self.SocketConnected = False
 
-        self.msg_socket = socket.socket()
+        self.msg_socket = self._new_socket()
         self.tcpconn = None
         self.listen_ip = ""
         self.callback = None
@@ -43,6 +43,10 @@ class Connection(object):
         self._context = 0x00
         self._context_index = 0
         self._originator_serial = 42
+        self._receive_buffer = bytearray(8192)
+        self._receive_view = memoryview(self._receive_buffer)
+        self._receive_start = 0
+        self._receive_end = 0
         self._ot_connection_id = 0
         self._to_connection_id = 0
         self._registered = False
@@ -57,26 +61,55 @@ class Connection(object):
         """
         return self._connect(connected)
 
+    def _new_socket(self):
+        """
+        The socket a new connection starts with, replaced when it connects
+        """
+        return socket.socket()
+
     def send(self, request, connected=True, slot=None):
         """
         Send the request to the PLC
         Return the status and data
         """
-        if connected:
-            eip_header = self._build_eip_header(request)
-        else:
-            if self.parent.Route or slot is not None:
-                path = self._unconnected_path(slot)
-                if len(request) %2:
-                    frame = self._build_unconnected_send(len(request)) + request + b'\x00' + path
-                else:
-                    frame = self._build_unconnected_send(len(request)) + request + path
-            else:
-                frame = request
-            eip_header = self._build_rr_data_header(len(frame)) + frame
-        
+        eip_header = self._build_frame(request, connected, slot)
         return self._get_bytes(eip_header, connected)
 
+    def send_many(self, requests, window=1):
+        """
+        Send a list of connected requests, keeping up to window of them
+        in flight at once.  Replies are matched to their request by the
+        sequence count, the list returned is in the same order as the
+        requests.  Requests that got no reply are returned as (1, None)
+        """
+        replies = [(1, None)] * len(requests)
+        pending = {}
+        sent = 0
+        received = 0
+        try:
+            while received < len(requests):
+                frames = []
+                while sent < len(requests) and len(pending) < max(window, 1):
+                    frame = self._build_eip_header(requests[sent])
+                    pending[self._sequence(frame)] = sent
+                    frames.append(frame)
+                    sent += 1
+                if frames:
+                    self.Socket.sendall(b''.join(frames))
+
+                ret_data = self.receive_data()
+                if not ret_data:
+                    self.SocketConnected = False
+                    break
+                index = pending.pop(self._sequence(ret_data), None)
+                if index is not None:
+                    replies[index] = self._reply_status(ret_data, True), ret_data
+                    received += 1
+        except OSError:
+            self.SocketConnected = False
+
+        return replies
+
     def listen(self, ip_address, callback, port):
         """ Listen for CIP Data Table Write (0x4d) messages
         from the PLC, decode send the data to the callback
@@ -117,8 +150,13 @@ class Connection(object):
                 pass
             self.Socket = socket.socket()
             self.Socket.settimeout(self.parent.SocketTimeout)
+            self._receive_start = 0
+            self._receive_end = 0
             addr = socket.getaddrinfo(self.parent.IPAddress, self.parent.Port)[0][-1]
             self.Socket.connect(addr)
+            if hasattr(socket, 'TCP_NODELAY'):
+                # don't let Nagle hold back pipelined requests
+                self.Socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         # Changed to a more generic exception class as mpy does not have socket.error
         # Explanation in the docs: https://docs.micropython.org/en/latest/library/socket.html#functions
         except OSError as e:
@@ -162,6 +200,9 @@ class Connection(object):
                     self.ConnectionSize = 504
                     ret = self._forward_open()
 
+            if ret[0] and self.parent.TagCache is not None:
+                self.parent._run(self.parent._tag_cache_requests())
+
             return ret
 
         self.SocketConnected = True
@@ -187,6 +228,40 @@ class Connection(object):
         finally:
             pass
 
+    def _build_frame(self, request, connected, slot=None):
+        """
+        Wrap a CIP request in the encapsulation needed to send it,
+        either as connected data or as an (optionally routed)
+        unconnected message
+        """
+        if connected:
+            return self._build_eip_header(request)
+
+        if self.parent.Route or slot is not None:
+            path = self._unconnected_path(slot)
+            if len(request) %2:
+                frame = self._build_unconnected_send(len(request)) + request + b'\x00' + path
+            else:
+                frame = self._build_unconnected_send(len(request)) + request + path
+        else:
+            frame = request
+        return self._build_rr_data_header(len(frame)) + frame
+
+    def _sequence(self, packet):
+        """
+        Get the sequence count of a connected request or reply
+        """
+        return unpack_from('<H', packet, 44)[0]
+
+    def _reply_status(self, ret_data, connected):
+        """
+        Get the CIP general status out of a reply
+        """
+        if connected:
+            return unpack_from('<B', ret_data, 48)[0]
+        else:
+            return unpack_from('<B', ret_data, 42)[0]
+
     def _get_bytes(self, data, connected):
         """
         Sends data and gets the return data, optionally asserting data size limit
@@ -195,11 +270,7 @@ class Connection(object):
             self.Socket.send(data)
             ret_data = self.receive_data()
             if ret_data:
-                if connected:
-                    status = unpack_from('<B', ret_data, 48)[0]
-                else:
-                    status = unpack_from('<B', ret_data, 42)[0]
-                return status, ret_data
+                return self._reply_status(ret_data, connected), ret_data
             else:
                 self.SocketConnected = False
                 return 1, None
@@ -218,21 +289,58 @@ class Connection(object):
         the length of the payload.  We can use that to keep calling
         socket receive until the entire payload is received.  This only happens
         when using LargeForwardOpen
+
+        The socket is read straight into a buffer that is reused for
+        every packet, the packet is copied out of it once.  When requests
+        are pipelined, a receive can also run into the next reply,
+        anything past the end of this packet is kept for the next call.
         """
-        data = b''
         try:
-            part = self.Socket.recv(4096)
-            payload_len = unpack_from('<H', part, 2)[0]
-            data += part
-
-            while len(data)-24 < payload_len:
-                part = self.Socket.recv(4096)
-                data += part
+            if not self._fill_receive_buffer(24):
+                return None
+            packet_len = unpack_from('<H', self._receive_buffer, self._receive_start + 2)[0] + 24
+            if not self._fill_receive_buffer(packet_len):
+                return None
         except (Exception, ):
             return None
 
+        start = self._receive_start
+        data = bytes(self._receive_view[start:start + packet_len])
+        self._receive_start += packet_len
+        if self._receive_start == self._receive_end:
+            self._receive_start = 0
+            self._receive_end = 0
         return data
 
+    def _fill_receive_buffer(self, size):
+        """
+        Receive until the buffer holds at least size bytes past the
+        start of the current packet.  The buffer grows when a packet
+        doesn't fit in it.
+        """
+        while self._receive_end - self._receive_start < size:
+            if self._receive_start + size > len(self._receive_buffer):
+                # move what is left of the buffer to the front
+                pending = self._receive_buffer[self._receive_start:self._receive_end]
+                if size > len(self._receive_buffer):
+                    self._receive_buffer = bytearray(max(size, 2 * len(self._receive_buffer)))
+                    self._receive_view = memoryview(self._receive_buffer)
+                self._receive_buffer[:len(pending)] = pending
+                self._receive_start = 0
+                self._receive_end = len(pending)
+
+            if hasattr(self.Socket, 'recv_into'):
+                count = self.Socket.recv_into(self._receive_view[self._receive_end:])
+            else:
+                part = self.Socket.recv(len(self._receive_buffer) - self._receive_end)
+                count = len(part)
+                self._receive_buffer[self._receive_end:self._receive_end + count] = part
+            if not count:
+                return False
+            self._receive_end += count
+
+        return True
+
     def _wait_for_connection(self):
         """ Wait for the incoming connection request.  This happens prior
         to the CIP Data Table Write.
@@ -0,0 +1,122 @@
+"""
+   Copyright 2022 Dustin Roeder (dmroeder@gmail.com)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+
+class PackingReport(object):
+    """
+    How full the multi-service packets of a request were, PLC.Packing
+    keeps the report of the last multi-tag read or write and
+    ReadPlan.Packing the report of the plan's packets.
+
+    Sizes has the (request, reply) size of each packet in bytes, a
+    packet is full when the larger of the two reaches Limit.
+    """
+
+    def __init__(self, limit, sizes):
+        """
+        limit: bytes available for the services of a packet
+        sizes: list of (request size, reply size), one per packet
+        """
+        self.Limit = limit
+        self.Sizes = sizes
+
+    def __repr__(self):
+
+        return 'PackingReport(Packets={}, FillRatio={:.3f})'.format(self.Packets, self.FillRatio)
+
+    def __str__(self):
+
+        return '{} packets, {:.1%} full'.format(self.Packets, self.FillRatio)
+
+    @property
+    def Packets(self):
+        """
+        Number of packets
+        """
+        return len(self.Sizes)
+
+    @property
+    def FillRatio(self):
+        """
+        Bytes used over bytes available, the larger of the request and
+        reply of each packet counting
+        """
+        if not self.Sizes or not self.Limit:
+            return 0.0
+        return sum(max(size) for size in self.Sizes) / float(self.Limit * len(self.Sizes))
+
+
+class ReadPlan(object):
+    """
+    A fixed list of tags to read, returned by PLC.CompileReadPlan().
+
+    The first execute() gets the data types of the tags, then builds the
+    multi-service requests once.  For each request the plan also keeps
+    the header the reply will start with when every tag is read
+    successfully, and a single struct format that unpacks all of the
+    values in the reply, with their data types.  Executing the plan after
+    that only sends the requests, compares the reply headers, unpacks the
+    values and compares their data types.
+
+    A reply that doesn't match (an error, or a tag whose type changed)
+    is parsed the same way Read parses it.  Arrays share the packets of
+    the tags that aren't plain atomic values, arrays too large for a
+    packet, and everything when talking to a Micro800, are read one tag
+    at a time.
+    """
+
+    def __init__(self, plc, tags):
+        """
+        plc: PLC (or AsyncPLC) the tags are read from
+        tags: list of [tag, count, data type]
+        """
+        self.PLC = plc
+        self.Tags = tags
+        self.Packets = None
+        self.Packing = None
+
+        # for each packet, the index in Tags of the tags it reads, and when
+        # all of them are plain atomic values, the reply header, format and
+        # the data type of each value
+        self.positions = []
+        self.headers = []
+        self.formats = []
+        self.types = []
+        # tags that are read one at a time
+        self.singles = []
+
+    def __repr__(self):
+
+        return 'ReadPlan(Tags={}, Packets={})'.format(len(self.Tags), self.PacketCount)
+
+    @property
+    def PacketCount(self):
+        """
+        Number of requests each execute() sends, None until the plan
+        has been executed
+        """
+        if self.Packets is None:
+            return None
+        return len(self.Packets) + len(self.singles)
+
+    def execute(self):
+        """
+        Read the tags, with AsyncPLC this is a coroutine
+
+        returns a list of Response class (.TagName, .Value, .Status),
+        in the same order as the tags
+        """
+        return self.PLC._read_plan(self)
@@ -0,0 +1,331 @@
+"""
+   Copyright 2022 Dustin Roeder (dmroeder@gmail.com)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+import os
+import time
+
+from struct import Struct, error as StructError, pack
+
+from pylogix.eip import parse_tag_name
+
+# a log file starts with the magic and the version, then the number of
+# columns and the size of a record
+LOG_MAGIC = b'PLXLOG'
+LOG_VERSION = 1
+LOG_EXTENSION = '.plxlog'
+_HEADER = Struct('<6sHII')
+# each column is described by its type, width and the length of its name,
+# followed by the name
+_COLUMN = Struct('<HHH')
+
+# string columns, the width is the number of bytes kept
+STRING_TYPE = 0xda
+# struct format of each column type, by CIP data type
+_FORMATS = {0xc0: 'Q', 0xc1: '?', 0xc2: 'b', 0xc3: 'h', 0xc4: 'i', 0xc5: 'q', 0xc6: 'B', 0xc7: 'H',
+            0xc8: 'I', 0xc9: 'Q', 0xca: 'f', 0xcb: 'd', 0xcc: 'Q', 0xd1: 'B', 0xd2: 'H', 0xd3: 'I',
+            0xd6: 'I', 0xd7: 'q', 0xdf: 'q'}
+# strings longer than the controller's STRING are cut to this, unless
+# the data type says otherwise
+STRING_WIDTH = 82
+
+
+def column_for(plc, response):
+    """
+    The (data type, width) of the column a tag is recorded in, from the
+    data type pylogix found when reading it, or from its value.  Tags that
+    couldn't be read are recorded as LREAL.
+
+    returns None for values that aren't a single value (arrays, structures)
+    """
+    value = response.Value
+    base_tag = parse_tag_name(response.TagName)[1]
+    data_type, data_len = plc.KnownTags.get(base_tag, (None, 0))
+
+    if isinstance(value, bool):
+        return 0xc1, 1
+    if isinstance(value, str):
+        width = data_len - 4 if data_type == 0xa0 and data_len > 4 else STRING_WIDTH
+        return STRING_TYPE, width
+    if isinstance(value, (int, float)):
+        if data_type in _FORMATS and data_type != 0xc1:
+            return data_type, Struct('<' + _FORMATS[data_type]).size
+        return (0xcb, 8) if isinstance(value, float) else (0xc5, 8)
+    if value is None and response.Status != 'Success':
+        return 0xcb, 8
+    return None
+
+
+def column_format(data_type, width):
+    """
+    struct format of a column
+    """
+    if data_type == STRING_TYPE:
+        return '{}s'.format(width)
+    return _FORMATS[data_type]
+
+
+class LogWriter(object):
+    """
+    Appends scans of a fixed list of tags to log files in a directory.
+
+    A log file starts with a header naming the tags and the data type of
+    each one's column, followed by one fixed size record per scan: the
+    time of the scan (seconds since the epoch, a double), a bit per tag
+    set when the tag was read, then every tag's value.  A record is packed
+    with a single struct, so the file can be read back (LogReader) without
+    the controller.
+
+    A new file is started every hour when rotate_hourly is True, and
+    before a file would grow past max_size bytes when it is given.  Files
+    are named after the local time of their first scan.
+    """
+
+    def __init__(self, directory, tags, columns, rotate_hourly=True, max_size=None, prefix='record'):
+        """
+        directory: directory the log files are written to
+        tags: names of the tags
+        columns: (data type, width) of each tag, see column_for()
+        rotate_hourly: start a new file every hour
+        max_size: start a new file before a file grows past this many bytes
+        prefix: start of the file names
+        """
+        self.Directory = directory
+        self.Tags = list(tags)
+        self.Columns = list(columns)
+        self.RotateHourly = rotate_hourly
+        self.MaxSize = max_size
+        self.Prefix = prefix
+        self.FileName = None
+        self.Records = 0
+
+        count = len(self.Tags)
+        self.mask_size = (count + 7) // 8
+        self.formats = [column_format(*column) for column in self.Columns]
+        self.struct = Struct('<d{}s'.format(self.mask_size) + ''.join(self.formats))
+        # value written for a tag that wasn't read
+        self.defaults = [b'' if column[0] == STRING_TYPE else 0 for column in self.Columns]
+        self.encoders = [column[0] == STRING_TYPE for column in self.Columns]
+        self.header = self._header()
+
+        self.file = None
+        self.size = 0
+        self.hour = None
+
+    def __repr__(self):
+
+        return 'LogWriter(Directory={}, Tags={}, RecordSize={}, FileName={})'.format(
+            self.Directory, len(self.Tags), self.RecordSize, self.FileName)
+
+    @property
+    def RecordSize(self):
+        """
+        Size of a scan in the log in bytes
+        """
+        return self.struct.size
+
+    def write(self, timestamp, responses):
+        """
+        Append a scan
+
+        timestamp: time of the scan, seconds since the epoch
+        responses: Response of each tag, in the order of the tags
+        """
+        values = list(self.defaults)
+        mask = 0
+        for i, response in enumerate(responses):
+            if response.Status != 'Success' or response.Value is None:
+                continue
+            value = response.Value
+            if self.encoders[i]:
+                if not isinstance(value, str):
+                    continue
+                value = value.encode('utf-8')
+            values[i] = value
+            mask |= 1 << i
+
+        try:
+            record = self.struct.pack(timestamp, mask.to_bytes(self.mask_size, 'little'), *values)
+        except (StructError, TypeError):
+            record = self._pack_checked(timestamp, values, mask)
+
+        self._rotate(timestamp)
+        self.file.write(record)
+        self.file.flush()
+        self.size += len(record)
+        self.Records += 1
+
+    def close(self):
+        """
+        Close the current file
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    def _pack_checked(self, timestamp, values, mask):
+        """
+        Pack a record whose values don't all fit their column (a tag's
+        data type changed), the ones that don't fit are left out
+        """
+        for i, value in enumerate(values):
+            try:
+                pack('<' + self.formats[i], value)
+            except (StructError, TypeError):
+                values[i] = self.defaults[i]
+                mask &= ~(1 << i)
+        return self.struct.pack(timestamp, mask.to_bytes(self.mask_size, 'little'), *values)
+
+    def _rotate(self, timestamp):
+        """
+        Start a new file when there is none yet, the hour changed or the
+        current one is full
+        """
+        local = time.localtime(timestamp)
+        hour = local[:4]
+        if self.file is not None:
+            if self.RotateHourly and hour != self.hour:
+                self.close()
+            elif self.MaxSize and self.size + self.RecordSize > self.MaxSize and self.size > len(self.header):
+                self.close()
+        if self.file is not None:
+            return
+
+        if not os.path.isdir(self.Directory):
+            os.makedirs(self.Directory)
+        name = '{}_{}'.format(self.Prefix, time.strftime('%Y%m%d_%H%M%S', local))
+        path = os.path.join(self.Directory, name + LOG_EXTENSION)
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.Directory, '{}_{}{}'.format(name, suffix, LOG_EXTENSION))
+            suffix += 1
+
+        self.file = open(path, 'xb')
+        self.file.write(self.header)
+        self.FileName = path
+        self.size = len(self.header)
+        self.hour = hour
+
+    def _header(self):
+        """
+        The header every file starts with
+        """
+        header = [_HEADER.pack(LOG_MAGIC, LOG_VERSION, len(self.Tags), self.struct.size)]
+        for tag, (data_type, width) in zip(self.Tags, self.Columns):
+            name = tag.encode('utf-8')
+            header.append(_COLUMN.pack(data_type, width, len(name)))
+            header.append(name)
+        return b''.join(header)
+
+
+class LogReader(object):
+    """
+    Reads a log file written by LogWriter
+
+        with LogReader('record_20220418_150000.plxlog') as log:
+            for timestamp, values in log:
+                ...
+
+    values has the value of each tag, None when the tag wasn't read.  A
+    record cut short (the recorder was stopped while writing it) is
+    ignored.
+    """
+
+    def __init__(self, filename):
+        """
+        filename: the log file
+        """
+        self.FileName = filename
+        self.file = open(filename, 'rb')
+
+        data = self.file.read(_HEADER.size)
+        if len(data) < _HEADER.size:
+            self.close()
+            raise ValueError('{} is not a pylogix log file'.format(filename))
+        magic, version, count, record_size = _HEADER.unpack(data)
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            self.close()
+            raise ValueError('{} is not a pylogix log file'.format(filename))
+
+        self.Tags = []
+        self.Columns = []
+        for _ in range(count):
+            data = self.file.read(_COLUMN.size)
+            if len(data) < _COLUMN.size:
+                self.close()
+                raise ValueError('{} has an invalid header'.format(filename))
+            data_type, width, length = _COLUMN.unpack(data)
+            name = self.file.read(length)
+            if len(name) < length or (data_type != STRING_TYPE and data_type not in _FORMATS):
+                self.close()
+                raise ValueError('{} has an invalid header'.format(filename))
+            self.Tags.append(name.decode('utf-8', 'replace'))
+            self.Columns.append((data_type, width))
+
+        self.mask_size = (count + 7) // 8
+        self.struct = Struct('<d{}s'.format(self.mask_size) +
+                             ''.join(column_format(*column) for column in self.Columns))
+        if self.struct.size != record_size:
+            self.close()
+            raise ValueError('{} has an invalid header'.format(filename))
+        self.strings = [i for i, column in enumerate(self.Columns) if column[0] == STRING_TYPE]
+
+    def __repr__(self):
+
+        return 'LogReader(FileName={}, Tags={})'.format(self.FileName, len(self.Tags))
+
+    def __iter__(self):
+
+        return self.records()
+
+    def records(self, chunk=256):
+        """
+        Generator of (timestamp, values) for each scan in the file, the
+        file is read chunk records at a time
+        """
+        size = self.struct.size
+        while True:
+            data = self.file.read(size * chunk)
+            for offset in range(0, len(data) - size + 1, size):
+                record = self.struct.unpack_from(data, offset)
+                mask = int.from_bytes(record[1], 'little')
+                values = list(record[2:])
+                for i in self.strings:
+                    values[i] = values[i].rstrip(b'\x00').decode('utf-8', 'replace')
+                for i in range(len(values)):
+                    if not mask >> i & 1:
+                        values[i] = None
+                yield record[0], values
+            if len(data) < size * chunk:
+                return
+
+    def close(self):
+
+        self.file.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
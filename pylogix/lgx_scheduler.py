@@ -0,0 +1,164 @@
+"""
+   Copyright 2022 Dustin Roeder (dmroeder@gmail.com)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import math
+import time
+
+if hasattr(time, 'monotonic'):
+    clock = time.monotonic
+else:
+    clock = time.time
+
+
+class Scheduler(object):
+    """
+    Fixed rate scan scheduler.
+
+    Every scan is given an absolute deadline of start + n * period, so a
+    slow scan never pushes the following scans back.  A scan that runs
+    past the next deadline is counted as an overrun and the next scan
+    starts straight away.  When it runs past more than one, the slots it
+    can no longer make are skipped (counted in Missed) to get back on the
+    original time grid.
+    """
+
+    def __init__(self, period):
+        """
+        period: scan period in seconds
+        """
+        self.Period = period
+        self.Cycles = 0
+        self.Overruns = 0
+        self.Missed = 0
+
+        self._deadline = None
+        self._last_start = None
+        self._period_count = 0
+        self._period_sum = 0.0
+        self._period_sum_sq = 0.0
+        self._period_min = None
+        self._period_max = None
+        self._late_max = 0.0
+
+    def __repr__(self):
+
+        return 'Scheduler(Period={}, Cycles={}, Overruns={}, Missed={}, MeanPeriod={}, Jitter={})'.format(
+            self.Period, self.Cycles, self.Overruns, self.Missed, self.MeanPeriod, self.Jitter)
+
+    def __str__(self):
+
+        return '{} {} {} {} {} {}'.format(
+            self.Period, self.Cycles, self.Overruns, self.Missed, self.MeanPeriod, self.Jitter)
+
+    @property
+    def MeanPeriod(self):
+        """
+        Average time between the start of consecutive scans, in seconds
+        """
+        if not self._period_count:
+            return None
+        return self._period_sum / self._period_count
+
+    @property
+    def MinPeriod(self):
+        return self._period_min
+
+    @property
+    def MaxPeriod(self):
+        return self._period_max
+
+    @property
+    def Jitter(self):
+        """
+        Standard deviation of the actual scan period, in seconds
+        """
+        if not self._period_count:
+            return None
+        mean = self._period_sum / self._period_count
+        variance = self._period_sum_sq / self._period_count - mean * mean
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def MaxLateness(self):
+        """
+        Largest delay between a deadline and the scan actually starting
+        """
+        return self._late_max
+
+    def wait(self):
+        """
+        Block until the next scan is due.  The first call returns straight
+        away and starts the time grid.
+
+        returns the number of deadlines that were missed since the
+        previous scan (0 when the previous scan finished in time)
+        """
+        missed = self.advance()
+        delay = self.remaining()
+        if delay > 0:
+            time.sleep(delay)
+        self.start()
+        return missed
+
+    def advance(self):
+        """
+        Move to the deadline of the next scan, skipping the ones that
+        were missed.  wait() is advance(), a sleep of remaining() seconds
+        and start(), split up so the sleep can be awaited instead.
+
+        returns the number of deadlines that were missed
+        """
+        now = clock()
+        missed = 0
+        if self._deadline is None:
+            self._deadline = now
+        else:
+            self._deadline += self.Period
+            if now > self._deadline:
+                # the last scan overran, skip any slots we can no longer
+                # make and run the next one immediately
+                missed = int((now - self._deadline) / self.Period)
+                self._deadline += missed * self.Period
+                self.Overruns += 1
+                self.Missed += missed
+        return missed
+
+    def remaining(self):
+        """
+        Seconds until the next scan is due, 0 when it's already due
+        """
+        return max(self._deadline - clock(), 0.0)
+
+    def start(self):
+        """
+        Record the start of a scan
+        """
+        now = clock()
+        late = max(now - self._deadline, 0.0)
+        if late > self._late_max:
+            self._late_max = late
+
+        if self._last_start is not None:
+            period = now - self._last_start
+            self._period_count += 1
+            self._period_sum += period
+            self._period_sum_sq += period * period
+            if self._period_min is None or period < self._period_min:
+                self._period_min = period
+            if self._period_max is None or period > self._period_max:
+                self._period_max = period
+        self._last_start = now
+        self.Cycles += 1
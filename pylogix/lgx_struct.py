@@ -0,0 +1,222 @@
+"""
+   Copyright 2022 Dustin Roeder (dmroeder@gmail.com)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from collections import namedtuple
+from struct import Struct, calcsize, unpack_from
+
+from .lgx_bits import bytes_to_bits
+
+# BOOL members are kept in hidden SINTs named with this prefix
+HIDDEN_PREFIX = 'ZZZZZZZZZZ'
+
+
+def is_string_udt(udt):
+    """
+    Check if a UDT is a string type (STRING or a user defined string),
+    a LEN DINT followed by a DATA SINT array
+    """
+    names = [field.TagName for field in udt.Fields]
+    return names == ['LEN', 'DATA'] and udt.Fields[1].SymbolType == 0xc2
+
+
+def member_layout(field):
+    """
+    The array size (or bit number for BOOLs) and the offset of a UDT
+    member, from its definition in the template
+    """
+    info, typ, offset = unpack_from('<HHI', field.Bytes, 0)
+    return info, offset
+
+
+def udt_size(udt, cip_types):
+    """
+    Size of a UDT in bytes.  The template gives it, UDTs restored from
+    an older tag cache don't have it, so it's worked out from the
+    members, rounded up to 4 bytes like the controller does.
+    """
+    if udt.Size:
+        return udt.Size
+
+    end = 0
+    for field in udt.Fields:
+        info, offset = member_layout(field)
+        count = info if field.Array else 1
+        if field.Struct:
+            size = 0
+        else:
+            size = cip_types.get(field.SymbolType, (1,))[0]
+        end = max(end, offset + size * max(count, 1))
+    return (end + 3) // 4 * 4
+
+
+class StructDecoder(object):
+    """
+    Decodes the data of a UDT, the reply to reading a structure, into
+    its members.  It is compiled once from the template GetTagList
+    read: the atomic members and atomic arrays are unpacked with a
+    single struct.Struct, BOOL members are taken from their bit, string
+    members are decoded to str and nested UDTs use a decoder of their
+    own.
+
+    The members are returned as a dict, or as a namedtuple when record
+    is True.  Arrays are returned as lists.
+    """
+    __slots__ = ('UDT', 'Size', 'Names', 'Scalars', 'Struct', 'items', 'record')
+
+    def __init__(self, udt, udts, cip_types, encoding='utf-8', record=False):
+        """
+        udt: the UDT to decode
+        udts: PLC.UDT, for the nested UDTs
+        cip_types: PLC.CIPTypes
+        encoding: encoding of the string members
+        record: return a namedtuple instead of a dict
+        """
+        self.UDT = udt
+        self.Size = udt_size(udt, cip_types)
+        self.Names = []
+        # the members decoded to a single value (not an array or a
+        # nested UDT), by lower case name
+        self.Scalars = {}
+        self.record = None
+        # [kind, position, array size] of each member, position is the
+        # index in the values of the single unpack for atomic members
+        self.items = []
+
+        atomic = []
+        for field in udt.Fields:
+            if field.TagName.startswith(HIDDEN_PREFIX):
+                continue
+            info, offset = member_layout(field)
+            count = info if field.Array else 0
+            nested = udts.get(field.DataTypeValue) if field.Struct else None
+
+            if nested is not None and is_string_udt(nested):
+                length_offset = member_layout(nested.Fields[0])[1]
+                data_offset, data_count = member_layout(nested.Fields[1])[1], nested.Fields[1].Size
+                item = ('string', (offset, length_offset, data_offset, data_count, encoding, udt_size(nested, cip_types)),
+                        count)
+            elif nested is not None:
+                item = ('struct', (offset, StructDecoder(nested, udts, cip_types, encoding, record)), count)
+            elif field.Struct:
+                # the template of the member wasn't read, keep the bytes
+                item = ('bytes', (offset, offset), count)
+            elif field.SymbolType == 0xc1 and not field.Array:
+                item = ('bool', (offset, info), count)
+            elif field.SymbolType == 0xd3 and field.Array:
+                # BOOL arrays are arrays of DWORDs
+                item = ('bits', (offset, info * 32), count)
+            elif field.SymbolType in cip_types and calcsize(cip_types[field.SymbolType][2]) == \
+                    cip_types[field.SymbolType][0]:
+                fmt = cip_types[field.SymbolType][2][1:]
+                atomic.append((offset, fmt, max(count, 1), len(self.items)))
+                item = ('atomic', None, count)
+            else:
+                item = ('bytes', (offset, offset + cip_types.get(field.SymbolType, (1,))[0] * max(count, 1)), count)
+
+            self.Names.append(field.TagName)
+            self.items.append(list(item))
+            if item[0] in ('atomic', 'bool', 'string') and not count:
+                self.Scalars[field.TagName.lower()] = field.TagName
+
+        # members kept as bytes end where the next member starts
+        offsets = sorted(member_layout(field)[1] for field in udt.Fields)
+        for item in self.items:
+            if item[0] == 'bytes' and item[1][0] == item[1][1]:
+                start = item[1][0]
+                item[1] = (start, min([o for o in offsets if o > start] or [self.Size]))
+
+        # one format for all of the atomic members, in the order they
+        # are in the structure
+        fmt = '<'
+        position = 0
+        index = 0
+        for offset, member_fmt, count, item in sorted(atomic):
+            if offset < position:
+                # overlapping members, unpack this one on its own
+                self.items[item][1] = Struct('<{}{}'.format(count, member_fmt)), offset
+                continue
+            if offset > position:
+                fmt += '{}x'.format(offset - position)
+            fmt += '{}{}'.format(count, member_fmt)
+            position = offset + calcsize('<{}{}'.format(count, member_fmt))
+            self.items[item][1] = index
+            index += count
+        self.Struct = Struct(fmt)
+
+        if record:
+            name = udt.Name if udt.Name.isidentifier() else 'Record'
+            self.record = namedtuple(name, self.Names, rename=True)
+
+    def __repr__(self):
+
+        return 'StructDecoder(UDT={}, Size={}, Members={})'.format(self.UDT.Name, self.Size, len(self.Names))
+
+    def decode(self, data, offset=0):
+        """
+        Decode the structure at offset in data
+        """
+        values = self.Struct.unpack_from(data, offset)
+        members = []
+        for kind, position, count in self.items:
+            if kind == 'atomic':
+                if isinstance(position, int):
+                    value = list(values[position:position + count]) if count else values[position]
+                else:
+                    member_struct, member_offset = position
+                    value = list(member_struct.unpack_from(data, offset + member_offset))
+                    if not count:
+                        value = value[0]
+            elif kind == 'bool':
+                byte_offset, bit = position
+                value = bool(data[offset + byte_offset] >> bit & 1)
+            elif kind == 'bits':
+                bit_offset, bits = position
+                value = bytes_to_bits(data[offset + bit_offset:offset + bit_offset + bits // 8], 0, bits)
+            elif kind == 'string':
+                value = self._decode_strings(data, offset, position, count)
+            elif kind == 'struct':
+                member_offset, decoder = position
+                if count:
+                    value = decoder.decode_array(data, offset + member_offset, count)
+                else:
+                    value = decoder.decode(data, offset + member_offset)
+            else:
+                start, end = position
+                value = bytes(data[offset + start:offset + end])
+            members.append(value)
+
+        if self.record is not None:
+            return self.record(*members)
+        return dict(zip(self.Names, members))
+
+    def decode_array(self, data, offset, count):
+        """
+        Decode count structures, one after the other, starting at offset
+        """
+        return [self.decode(data, offset + i * self.Size) for i in range(count)]
+
+    def _decode_strings(self, data, offset, position, count):
+        """
+        Decode a string member, or an array of them
+        """
+        member_offset, length_offset, data_offset, data_count, encoding, size = position
+        strings = []
+        for i in range(max(count, 1)):
+            start = offset + member_offset + i * size
+            length = min(unpack_from('<i', data, start + length_offset)[0], data_count)
+            raw = bytes(data[start + data_offset:start + data_offset + max(length, 0)])
+            strings.append(raw.decode(encoding, 'replace'))
+        return strings if count else strings[0]
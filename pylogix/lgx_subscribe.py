@@ -0,0 +1,186 @@
+"""
+   Copyright 2022 Dustin Roeder (dmroeder@gmail.com)
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+import time
+
+from array import array
+
+from .lgx_scheduler import Scheduler
+
+# larger integers don't fit in a double exactly, they're compared as is
+_MAX_EXACT = 1 << 53
+
+
+def parse_deadband(deadband):
+    """
+    Split a deadband into its value and whether it's a percentage of
+    the last value reported.  A number is an absolute deadband, a
+    string ending with % a percentage.
+    """
+    if isinstance(deadband, str):
+        deadband = deadband.strip()
+        if deadband.endswith('%'):
+            return float(deadband[:-1]), True
+    return float(deadband), False
+
+
+class Subscription(object):
+    """
+    Polls a fixed list of tags and reports only the values that changed,
+    returned by PLC.Subscribe().
+
+    The first poll reports every tag.  After that a tag is reported when
+    its status changes, or when its value differs from the last value
+    reported: for numbers by more than the tag's deadband, for anything
+    else (strings, arrays, structures) when it isn't equal.  A deadband
+    is either absolute or a percentage of the last value reported.
+
+    The tags are read with a ReadPlan.  The last value reported for each
+    tag is kept in a table of doubles, values that aren't numbers are
+    kept on the side.  AsyncPLC.Subscribe() returns an AsyncSubscription,
+    whose poll() and run() are coroutines and changes() an async
+    generator.
+    """
+
+    def __init__(self, plc, tags, period=1.0, deadband=0, callback=None):
+        """
+        plc: PLC the tags are read from
+        tags: list of tags, or of (tag, deadband)
+        period: poll period in seconds, for changes() and run()
+        deadband: deadband of the tags that don't have one of their own
+        callback: called with the Response of each change
+        """
+        names = []
+        deadbands = []
+        for tag in tags:
+            if isinstance(tag, (list, tuple)):
+                names.append(tag[0])
+                deadbands.append(parse_deadband(tag[1] if len(tag) > 1 else deadband))
+            else:
+                names.append(tag)
+                deadbands.append(parse_deadband(deadband))
+
+        self.PLC = plc
+        self.Tags = names
+        self.Period = period
+        self.Callback = callback
+        self.Plan = plc.CompileReadPlan(names)
+        self.Scheduler = None
+        self.Timestamp = None
+        self.Polls = 0
+        self.Changes = 0
+
+        count = len(names)
+        self.deadbands = array('d', [d[0] for d in deadbands])
+        self.percent = bytearray(d[1] for d in deadbands)
+        self.reported = bytearray(count)
+        # last value reported, NaN when it wasn't a number
+        self.numbers = array('d', [float('nan')] * count)
+        # last value reported when it wasn't a number, and last status
+        # when it wasn't Success
+        self.others = {}
+        self.statuses = {}
+        self.running = False
+
+    def __repr__(self):
+
+        return '{}(Tags={}, Period={}, Polls={}, Changes={})'.format(
+            type(self).__name__, len(self.Tags), self.Period, self.Polls, self.Changes)
+
+    def poll(self):
+        """
+        Read the tags once
+
+        returns a list of Response class (.TagName, .Value, .Status) of
+        the tags that changed
+        """
+        return self._report(self.Plan.execute())
+
+    def _report(self, responses):
+        """
+        The changes in the responses of a poll, passed to the callback
+        """
+        self.Timestamp = time.time()
+        self.Polls += 1
+
+        changes = [response for i, response in enumerate(responses) if self._changed(i, response)]
+        self.Changes += len(changes)
+        if self.Callback is not None:
+            for change in changes:
+                self.Callback(change)
+        return changes
+
+    def changes(self):
+        """
+        Generator that polls the tags every Period, on a fixed time grid,
+        and yields each change.  Timestamp is the time of the poll the
+        change was found in.
+        """
+        self.Scheduler = Scheduler(self.Period)
+        self.running = True
+        while self.running:
+            self.Scheduler.wait()
+            for change in self.poll():
+                yield change
+
+    def run(self):
+        """
+        Poll the tags every Period until stop() is called, passing the
+        changes to the callback
+        """
+        for _ in self.changes():
+            pass
+
+    def stop(self):
+        """
+        Stop changes() and run() after the current poll
+        """
+        self.running = False
+
+    def _changed(self, i, response):
+        """
+        Compare a tag's value with the last one reported, and remember it
+        when it's reported
+        """
+        value = response.Value
+        status = response.Status
+        if self.reported[i] and status == self.statuses.get(i, 'Success'):
+            if status != 'Success':
+                return False
+
+            last = self.numbers[i]
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and abs(value) < _MAX_EXACT:
+                if last == last:
+                    deadband = self.deadbands[i]
+                    if self.percent[i]:
+                        deadband = abs(last) * deadband / 100.0
+                    if abs(value - last) <= deadband and (deadband or value == last):
+                        return False
+            elif last != last and value == self.others.get(i):
+                return False
+
+        self.reported[i] = 1
+        if status == 'Success':
+            self.statuses.pop(i, None)
+        else:
+            self.statuses[i] = status
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and abs(value) < _MAX_EXACT:
+            self.numbers[i] = value
+            self.others.pop(i, None)
+        else:
+            self.numbers[i] = float('nan')
+            self.others[i] = value
+        return True
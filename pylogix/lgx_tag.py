@@ -118,6 +118,7 @@ class UDT(object):
 
         self.Type = 0
         self.Name = ''
+        self.Size = 0
         self.Fields = []
         self.FieldsByName = {}
 
@@ -126,6 +127,7 @@ class UDT(object):
         props = ''
         props += 'Type={} '.format(self.Type)
         props += 'Name={} '.format(self.Name)
+        props += 'Size={} '.format(self.Size)
         props += 'Fields={} '.format(self.Fields)
         props += 'FieldsByName={}'.format(self.FieldsByName)
 
@@ -138,3 +140,53 @@ class UDT(object):
                 self.Name,
                 self.Fields,
                 self.FieldsByName)
+
+
+class TagHandle(object):
+    """
+    A tag that is read or written over and over, returned by PLC.Tag().
+
+    The first time the handle is used, the tag's data type is looked up
+    and the request path (IOI), the read request and the formats used to
+    pack and unpack the values are built.  After that, reading or writing
+    an atomic tag only sends the prebuilt request and unpacks the reply.
+
+    If the tag is deleted or its type changed in the project, get a new
+    handle with PLC.Tag().
+    """
+    __slots__ = ('TagName', 'BaseTag', 'Count', 'DataType', 'Size', 'Format', 'IOI',
+                 'read_request', 'read_format', 'write_header', 'write_format')
+
+    def __init__(self, tag_name, base_tag, count=1, data_type=None):
+
+        self.TagName = tag_name
+        self.BaseTag = base_tag
+        self.Count = count
+        self.DataType = data_type
+        self.Size = None
+        self.Format = None
+        self.IOI = None
+        self.read_request = None
+        self.read_format = None
+        self.write_header = None
+        self.write_format = None
+
+    def __repr__(self):
+
+        props = ''
+        props += 'TagName={}, '.format(self.TagName)
+        props += 'Count={}, '.format(self.Count)
+        props += 'DataType={}, '.format(self.DataType)
+        props += 'Size={}, '.format(self.Size)
+        props += 'Format={}'.format(self.Format)
+
+        return 'TagHandle({})'.format(props)
+
+    def __str__(self):
+
+        return '{} {} {} {} {}'.format(
+                self.TagName,
+                self.Count,
+                self.DataType,
+                self.Size,
+                self.Format)
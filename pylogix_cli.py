@@ -39,12 +39,14 @@ ERROR - No IPAdress specified.  Use IPAddress command.
 '''
 the following import is only necessary because eip.py is not in this directory
 '''
+import csv
 import sys
 import os
 import datetime
 import time
 
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from struct import pack, unpack, unpack_from
 
 # Prefer the pylogix package vendored alongside this script (it contains
@@ -55,11 +57,17 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 import pylogix
 from pylogix.lgx_response import Response
 from pylogix import PLC
+from pylogix.lgx_scheduler import Scheduler
+from pylogix.lgx_cache import TagCache
+from pylogix.lgx_record import LOG_EXTENSION, LogReader, LogWriter, column_for
 version = "0.1.9"
 comm = PLC()
 output_format = "raw"
 output_formats = ["raw", "readable", "minimal"]
 show_timing = False
+tag_file_chunk_size = 500
+fleet_workers = 32
+tag_cache_dir = os.environ.get("PYLOGIX_TAG_CACHE", "")
 
 #region CUSTOM COMMAND CODE
 def get_cip_attribute(plc, class_inst_id, attribute_id, instance_id, offset = 54):
@@ -268,20 +276,307 @@ def readTagFile(args):
         return
     words = args.split()
     filename = words[0]
+    outFile = ""
+    if len(words) > 1:
+        outFile = words[1]
     start_time = time.time()
-    outData = getTagValuesFromFile(filename)
-    if len(outData) > 0:
-        outFile = ""
-        if len(words) > 1:
-            outFile = words[1]
+    try:
+        tagFile = open(filename)
+    except Exception as error:
+        print("ERROR - Error opening the file {0}. {1}".format(filename, str(error)))
+        return
+    # The tag file is read, requested and written a chunk at a time so large
+    # files produce output straight away and memory use stays flat.
+    out = None
+    lineCount = 0
+    try:
+        with tagFile:
+            for outData in getTagValuesFromFile(tagFile):
+                if len(outData) == 0:
+                    continue
+                text = "\n".join(outData)
+                if lineCount > 0:
+                    text = "\n" + text
+                if len(outFile) > 0:
+                    if out is None:
+                        out = open(outFile, "w")
+                    out.write(text)
+                    out.flush()
+                else:
+                    print(text, end="", flush=True)
+                lineCount += len(outData)
+    finally:
+        if out is not None:
+            out.close()
+    if lineCount > 0:
         exec_time = time.time() - start_time
-        if len(outFile) > 0:
-            Path(outFile).write_text("\n".join(outData))
-        else:
-            print("\n".join(outData))
+        if len(outFile) == 0:
+            print()
         if (show_timing):
             print("Executed in {0:7.3f} seconds.".format(exec_time))
 
+def watch(args):
+    words = args.split()
+    if len(words) < 2 or not isNumber(words[1]) or float(words[1]) <= 0:
+        print("ERROR - Invalid arguments.  Usage: Watch <tagfile> <period_ms> [<outfile>]")
+        return
+    filename = words[0]
+    period = float(words[1]) / 1000.0
+    outFile = ""
+    if len(words) > 2:
+        outFile = words[2]
+    tags = readTagNames(filename)
+    if len(tags) == 0:
+        return
+
+    out = None
+    if len(outFile) > 0:
+        out = open(outFile, "a")
+    scheduler = Scheduler(period)
+    print("Watching {0} tags every {1:g} ms.  Press Ctrl+C to stop.".format(len(tags), period * 1000.0))
+    try:
+        while True:
+            waitForScan(scheduler)
+            timestamp = datetime.datetime.now().isoformat(" ", "milliseconds")
+            text = "\n".join(timestamp + " " + line for line in getTagValues(tags))
+            if out is not None:
+                out.write(text + "\n")
+                out.flush()
+            else:
+                print(text, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not None:
+            out.close()
+    print(formatScanStatistics(scheduler))
+
+def subscribe(args):
+    words = args.split()
+    if len(words) < 1 or (len(words) > 1 and isNumber(words[1]) and float(words[1]) <= 0):
+        print("ERROR - Invalid arguments.  Usage: Subscribe <tagfile> [<period_ms>] [<outfile>]")
+        return
+    filename = words[0]
+    period = 1.0
+    outFile = ""
+    if len(words) > 1 and isNumber(words[1]):
+        period = float(words[1]) / 1000.0
+        words = words[1:]
+    if len(words) > 1:
+        outFile = words[1]
+    tags = readSubscriptionTags(filename)
+    if len(tags) == 0:
+        return
+    try:
+        subscription = comm.Subscribe(tags, period)
+    except ValueError as error:
+        print("ERROR - Invalid deadband in {0}. {1}".format(filename, str(error)))
+        return
+
+    out = None
+    if len(outFile) > 0:
+        out = open(outFile, "a")
+    scheduler = Scheduler(period)
+    print("Subscribed to {0} tags every {1:g} ms.  Press Ctrl+C to stop.".format(len(tags), period * 1000.0))
+    try:
+        while True:
+            waitForScan(scheduler)
+            changes = subscription.poll()
+            if len(changes) == 0:
+                continue
+            timestamp = datetime.datetime.now().isoformat(" ", "milliseconds")
+            text = "\n".join(timestamp + " " + ret.TagName + "=" + formatTagValue(ret.Value) for ret in changes)
+            if out is not None:
+                out.write(text + "\n")
+                out.flush()
+            else:
+                print(text, flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not None:
+            out.close()
+    print("{0} change(s) reported.".format(subscription.Changes))
+    print(formatScanStatistics(scheduler))
+
+def record(args):
+    words = args.split()
+    if len(words) < 3 or not isNumber(words[1]) or float(words[1]) <= 0:
+        print("ERROR - Invalid arguments.  Usage: Record <tagfile> <period_ms> <dir> [Hourly | <max_mb>]")
+        return
+    filename = words[0]
+    period = float(words[1]) / 1000.0
+    directory = words[2]
+    rotateHourly = True
+    maxSize = None
+    if len(words) > 3 and words[3].casefold() != "hourly":
+        if not isNumber(words[3]) or float(words[3]) <= 0:
+            print("ERROR - Invalid rotation {0}, use Hourly or a size in MB.".format(words[3]))
+            return
+        rotateHourly = False
+        maxSize = int(float(words[3]) * 1024 * 1024)
+    tags = readTagNames(filename)
+    if len(tags) == 0:
+        return
+
+    plan = comm.CompileReadPlan(tags)
+    scheduler = Scheduler(period)
+    writer = None
+    keep = []
+    print("Recording {0} tags every {1:g} ms to {2}.  Press Ctrl+C to stop.".format(len(tags), period * 1000.0, directory))
+    try:
+        while True:
+            waitForScan(scheduler)
+            timestamp = time.time()
+            results = plan.execute()
+            if writer is None:
+                # the columns are sized from the data types found by the first scan
+                columns = [column_for(comm, ret) for ret in results]
+                for tag, column in zip(tags, columns):
+                    if column is None:
+                        print("WARNING - {0} is not a single value and is not recorded.".format(tag))
+                keep = [i for i, column in enumerate(columns) if column is not None]
+                if len(keep) == 0:
+                    return
+                writer = LogWriter(directory, [tags[i] for i in keep], [columns[i] for i in keep],
+                                   rotateHourly, maxSize)
+            writer.write(timestamp, [results[i] for i in keep])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        print("Recorded {0} scans of {1} tags, {2} bytes each.".format(writer.Records, len(keep), writer.RecordSize))
+    print(formatScanStatistics(scheduler))
+
+def export(args):
+    words = args.split()
+    if len(words) < 1:
+        print("ERROR - Invalid arguments.  Usage: Export <logfile | dir> [<outfile>]")
+        return
+    if os.path.isdir(words[0]):
+        files = sorted(os.path.join(words[0], name) for name in os.listdir(words[0]) if name.endswith(LOG_EXTENSION))
+    else:
+        files = [words[0]]
+    outFile = ""
+    if len(words) > 1:
+        outFile = words[1]
+
+    out = open(outFile, "w", newline="") if len(outFile) > 0 else sys.stdout
+    csvWriter = csv.writer(out)
+    columns = None
+    rowCount = 0
+    try:
+        for filename in files:
+            try:
+                log = LogReader(filename)
+            except (OSError, ValueError) as error:
+                print("ERROR - Error opening the file {0}. {1}".format(filename, str(error)))
+                continue
+            with log:
+                # a new header row whenever the recorded tags change
+                if log.Tags != columns:
+                    csvWriter.writerow(["Timestamp"] + log.Tags)
+                    columns = log.Tags
+                for timestamp, values in log:
+                    stamp = datetime.datetime.fromtimestamp(timestamp).isoformat(" ", "milliseconds")
+                    csvWriter.writerow([stamp] + ["" if value is None else value for value in values])
+                    rowCount += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if len(outFile) > 0:
+        print("Exported {0} scans from {1} file(s).".format(rowCount, len(files)))
+
+def fleet(args):
+    words = args.split()
+    if len(words) < 2:
+        print("ERROR - Invalid arguments.  Usage: Fleet <targetfile> <command> [<arguments>]")
+        return
+    targets = readTargets(words[0])
+    if len(targets) == 0:
+        return
+    command = words[1].casefold()
+    commandArgs = " ".join(words[2:]).casefold()
+    if command not in fleetCommands:
+        print("ERROR - Fleet supports these commands: {0}".format(", ".join(sorted(fleetCommands))))
+        return
+    if command == "readtagfile":
+        if len(words) > 3:
+            print("ERROR - Fleet does not support an outfile for ReadTagFile.")
+            return
+        # read the tag file once and share it between all the targets
+        commandArgs = readTagNames(words[2]) if len(words) > 2 else []
+        if len(commandArgs) == 0:
+            return
+
+    start_time = time.time()
+    workers = max(1, min(fleet_workers, len(targets)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for target in targets:
+            future = pool.submit(runFleetCommand, target, fleetCommands[command], commandArgs)
+            futures[future] = target
+        # results are printed from this thread only, as each target finishes
+        for future in as_completed(futures):
+            target = futures[future]
+            for line in future.result():
+                print("[{0}] {1}".format(formatTarget(target), line), flush=True)
+    if (show_timing):
+        print("Executed in {0:7.3f} seconds.".format(time.time() - start_time))
+
+def runFleetCommand(target, function, args):
+    ip, slot = target
+    plc = PLC(ip, slot if slot is not None else 0, comm.SocketTimeout)
+    plc.RequestWindow = comm.RequestWindow
+    if len(tag_cache_dir) > 0:
+        plc.TagCache = TagCache(tag_cache_dir)
+    try:
+        return function(plc, args)
+    except Exception as error:
+        return ["ERROR - " + str(error)]
+    finally:
+        plc.Close()
+
+def fleetRead(plc, args):
+    return [str(plc.Read(args))]
+
+def fleetReadTagFile(plc, tags):
+    return getTagValues(tags, plc)
+
+def fleetGetPLCTime(plc, args):
+    return [str(plc.GetPLCTime())]
+
+def fleetGetDeviceProperties(plc, args):
+    return [str(plc.GetDeviceProperties())]
+
+def fleetGetModuleProperties(plc, args):
+    if not args.isnumeric():
+        return ["ERROR - Invalid argument.  Please specify a slot number."]
+    return [str(plc.GetModuleProperties(int(args)))]
+
+def fleetGetFaultCodes(plc, args):
+    return [str(get_controller_fault(plc))]
+
+def fleetGetFaultInfo(plc, args):
+    return [str(get_controller_fault_info(plc))]
+
+def fleetGetProgramsList(plc, args):
+    programs = plc.GetProgramsList()
+    if programs.Value is None:
+        return [str(programs)]
+    return [str(program) for program in programs.Value]
+
+fleetCommands = {"read": fleetRead,
+                 "readtagfile": fleetReadTagFile,
+                 "getplctime": fleetGetPLCTime,
+                 "getdeviceproperties": fleetGetDeviceProperties,
+                 "getmoduleproperties": fleetGetModuleProperties,
+                 "getfaultcodes": fleetGetFaultCodes,
+                 "getfaultinfo": fleetGetFaultInfo,
+                 "getprogramslist": fleetGetProgramsList}
+
 def write(args):
     words = args.split()
     comm.Read(words[0])  # Always read the tag first since this will initiate the connection.
@@ -320,6 +615,13 @@ def output(args):
         print("Invalid output format")
     return
 
+def requestWindow(args):
+    if not args.isdigit() or int(args) < 1:
+        print("ERROR - Invalid argument.  Please specify the number of requests, e.g. 8.")
+        return
+    comm.RequestWindow = int(args)
+    print("Request window set to {}".format(args))
+
 def getHelp(args):
     print('''
     Commands: (Not case sensitive.)
@@ -340,10 +642,36 @@ def getHelp(args):
         GetTagList                  - Returns the list of tags in the target PLC.
         GetProgramsList             - Returns the list of programs.
         Output (Raw | Readable)     - Sets the output format.  Raw is the default.        
+        Window <count>              - Sets how many requests may be in flight at once.  1 is the default.
     
     Multi-Tag Commands: (Filenames are case sensitive.)
         ReadTagFile <filename> [<outfile>]
             - Returns the values of the tags from the file.
+        Watch <filename> <period_ms> [<outfile>]
+            - Reads the tags from the file every period_ms milliseconds until
+              Ctrl+C is pressed, then reports the actual scan period, jitter
+              and overruns.
+        Subscribe <filename> [<period_ms>] [<outfile>]
+            - Reads the tags from the file every period_ms milliseconds (1000
+              by default) and prints only the values that changed.  Each line
+              of the file is a tag, optionally followed by a deadband, e.g.
+              "Speed 0.5" or "Level 2%".
+        Record <filename> <period_ms> <dir> [Hourly | <max_mb>]
+            - Reads the tags from the file every period_ms milliseconds and
+              appends each scan to a compact binary log in dir.  A new log
+              file is started every hour (default) or when a file reaches
+              max_mb megabytes.
+        Export <logfile | dir> [<outfile>]
+            - Converts a Record log file, or every log file in dir, to CSV.
+
+    Fleet Commands:
+        Fleet <targetfile> <command> [<arguments>]
+            - Runs the command against every ip[,slot] target in the file
+              concurrently.  Each line of output is prefixed with its target.
+              Supported commands: Read, ReadTagFile, GetPLCTime,
+              GetDeviceProperties, GetModuleProperties, GetFaultCodes,
+              GetFaultInfo, GetProgramsList.  ReadTagFile prints the
+              values, an outfile is not supported.
           
     ''')
 
@@ -375,6 +703,16 @@ def parseCommand(command):
             read(getAdditionalArgs(command))
         elif (words[0] == "readtagfile"):
             readTagFile(getAdditionalArgs(command))
+        elif (words[0] == "watch"):
+            watch(getAdditionalArgsKeepCase(command))
+        elif (words[0] == "subscribe"):
+            subscribe(getAdditionalArgsKeepCase(command))
+        elif (words[0] == "record"):
+            record(getAdditionalArgsKeepCase(command))
+        elif (words[0] == "export"):
+            export(getAdditionalArgsKeepCase(command))
+        elif (words[0] == "fleet"):
+            fleet(getAdditionalArgsKeepCase(command))
         elif (words[0] == "write"):
             write(getAdditionalArgs(command))
         elif (words[0] == "version"):
@@ -385,6 +723,8 @@ def parseCommand(command):
             getProgramsList(getAdditionalArgs(command))
         elif (words[0] == "output"):
             output(getAdditionalArgs(command))
+        elif (words[0] == "window"):
+            requestWindow(getAdditionalArgs(command))
         else:
             print("ERROR - Unrecognized command.  Enter Help for a list of commands.")
 
@@ -425,31 +765,159 @@ def getAdditionalArgs(command):
         return " ".join(words[1:])
     else:
         return ""
+
+def getAdditionalArgsKeepCase(command):
+    """
+    Returns the arguments of a command as typed, for commands whose arguments
+    name files or directories they create.
+    """
+    words = command.split()
+    if (len(words) > 1):
+        return " ".join(words[1:])
+    else:
+        return ""
     
-def getTagValues(tags):
+def getTagValues(tags, plc=None):
+    """
+    Reads the tags and returns a list of "tag=value" strings in the same order
+    as the tags were given.  The tags are handed to pylogix as one list so they
+    are packed into multi-service requests rather than read one at a time.
+    """
+    if plc is None:
+        plc = comm
+    tags = [tag.strip() for tag in tags if len(tag.strip()) > 0]
+    if len(tags) == 0:
+        return []
+    try:
+        results = plc.Read(tags)
+        if len(results) != len(tags):
+            raise ValueError("Expected {0} results, got {1}".format(len(tags), len(results)))
+    except Exception as error:
+        # Fall back to reading the tags one at a time so a single bad tag
+        # is still reported on its own line.
+        return getTagValuesSingly(tags, plc)
+    outData = []
+    for tag, ret in zip(tags, results):
+        outData += [tag + "=" + formatTagValue(ret.Value)]
+    return outData
+
+def getTagValuesSingly(tags, plc=None):
+    if plc is None:
+        plc = comm
     outData = []
     for tag in tags:
-        if len(tag) > 0:
-            try:
-                result = comm.Read(tag).Value
-                if str(result) == "None":
-                    result = "!ERROR!"
-            except Exception as error:
-                #print("Error reading: " + tag + " - " + str(error))
-                outData += [tag + "=!ERROR!"]
-                continue
-            outData += [tag + "=" + str(result)]
+        try:
+            result = plc.Read(tag).Value
+        except Exception as error:
+            #print("Error reading: " + tag + " - " + str(error))
+            outData += [tag + "=!ERROR!"]
+            continue
+        outData += [tag + "=" + formatTagValue(result)]
     return outData
 
-def getTagValuesFromFile(filename):
+def formatTagValue(value):
+    if str(value) == "None":
+        return "!ERROR!"
+    return str(value)
+
+def getTagValuesFromFile(tagFile, chunkSize=None):
+    """
+    Generator that reads an open tag file chunkSize lines at a time and yields
+    the "tag=value" strings for each chunk as soon as it has been read from
+    the PLC.
+    """
+    if chunkSize is None:
+        chunkSize = tag_file_chunk_size
+    while True:
+        tags = [line.rstrip("\n") for line in islice(tagFile, chunkSize)]
+        if len(tags) == 0:
+            return
+        yield getTagValues(tags)
+
+def readTagNames(filename):
+    try:
+        with open(filename) as f:
+            return [line.strip() for line in f if len(line.strip()) > 0]
+    except Exception as error:
+        print("ERROR - Error opening the file {0}. {1}".format(filename, str(error)))
+        return []
+
+def readSubscriptionTags(filename):
+    """
+    Reads a Subscribe tag file, one "tag [deadband]" per line.  The deadband
+    is an absolute value, or a percentage of the last value reported when it
+    ends with %.  Tags without one are reported on any change.
+    """
     tags = []
+    for line in readTagNames(filename):
+        words = line.split()
+        if len(words) > 1:
+            tags.append((words[0], words[1]))
+        else:
+            tags.append(words[0])
+    return tags
+
+def readTargets(filename):
+    """
+    Reads a file of "ip[,slot]" targets, one per line.  Blank lines and lines
+    starting with # are ignored.
+    """
+    targets = []
     try:
-        tags = Path(filename).read_text().split("\n")
+        with open(filename) as f:
+            lines = [line.strip() for line in f]
     except Exception as error:
         print("ERROR - Error opening the file {0}. {1}".format(filename, str(error)))
         return []
-    outData = getTagValues(tags)
-    return outData
+    for line in lines:
+        if len(line) == 0 or line.startswith("#"):
+            continue
+        if not isIPAddress(line):
+            print("ERROR - Invalid target {0}, skipped.".format(line))
+            continue
+        targets.append(parseIPAndSlot(line))
+    return targets
+
+def formatTarget(target):
+    ip, slot = target
+    if slot is None:
+        return ip
+    return "{0},{1}".format(ip, slot)
+
+def waitForScan(scheduler):
+    """
+    Waits for the next scan of a scan loop, warning when the previous scan
+    overran its period.
+    """
+    overruns = scheduler.Overruns
+    missed = scheduler.wait()
+    if scheduler.Overruns > overruns:
+        if missed > 0:
+            print("WARNING - Scan overran its period, {0} scan(s) skipped.".format(missed))
+        else:
+            print("WARNING - Scan overran its period.")
+
+def formatScanStatistics(scheduler):
+    if scheduler.MeanPeriod is None:
+        return "Completed {0} scan(s).".format(scheduler.Cycles)
+    return ("Completed {0} scans.  Period {1:.3f} ms, actual {2:.3f} ms "
+            "(min {3:.3f}, max {4:.3f}), jitter {5:.3f} ms, "
+            "{6} overrun(s), {7} scan(s) skipped.").format(
+                scheduler.Cycles,
+                scheduler.Period * 1000.0,
+                scheduler.MeanPeriod * 1000.0,
+                scheduler.MinPeriod * 1000.0,
+                scheduler.MaxPeriod * 1000.0,
+                scheduler.Jitter * 1000.0,
+                scheduler.Overruns,
+                scheduler.Missed)
+
+def isNumber(s):
+    try:
+        float(s)
+    except ValueError:
+        return False
+    return True
 
 def isInteger(s):
     if s[0] in ('-', '+'):
@@ -461,6 +929,8 @@ def isInteger(s):
 #region MAIN
 def main():
     arguments = sys.argv
+    if len(tag_cache_dir) > 0:
+        comm.TagCache = TagCache(tag_cache_dir)
     if (len(arguments) > 1):
         if (isIPAddress(arguments[1])):
             ip, slot = parseIPAndSlot(arguments[1])
@@ -471,6 +941,9 @@ def main():
                 parseCommand(" ".join(arguments[2:]))
             else:
                 commandLoop()
+        else:
+            # commands that don't need a target, e.g. Fleet
+            parseCommand(" ".join(arguments[1:]))
     else:
         commandLoop()
     comm.Close()
@@ -0,0 +1,62 @@
+import unittest
+
+from pylogix.lgx_bits import BitArray, bits_to_int, bytes_to_bits, bytes_to_int, join_bits
+
+
+class BitsTests(unittest.TestCase):
+
+    def test_bytes_to_bits_lowest_bit_first(self):
+        self.assertEqual(bytes_to_bits(b'\x05', 0, 8), [True, False, True, False, False, False, False, False])
+
+    def test_bytes_to_bits_offset_across_bytes(self):
+        data = (0x0f0f0f0f).to_bytes(4, 'little')
+        self.assertEqual(bytes_to_bits(data, 6, 4), [False, False, True, True])
+
+    def test_bits_round_trip(self):
+        for value, count in ((0, 1), (1, 1), (0x5a, 8), (0x1234, 13), (0xdeadbeef, 32), ((1 << 70) - 3, 71)):
+            data = value.to_bytes((count + 7) // 8, 'little')
+            bits = bytes_to_bits(data, 0, count)
+            self.assertEqual(len(bits), count)
+            self.assertEqual(bits_to_int(bits), value)
+            self.assertEqual(bytes_to_int(data, 0, count), value)
+
+    def test_bytes_to_int_offset(self):
+        data = (0b1011_0110_0000).to_bytes(2, 'little')
+        self.assertEqual(bytes_to_int(data, 5, 6), 0b011011)
+
+    def test_bits_to_int_empty(self):
+        self.assertEqual(bits_to_int([]), 0)
+
+    def test_bit_array_matches_list(self):
+        value = 0x8001f00f
+        bits = BitArray.from_int(value, 32)
+        expected = bytes_to_bits(value.to_bytes(4, 'little'), 0, 32)
+        self.assertEqual(len(bits), 32)
+        self.assertEqual(list(bits), expected)
+        self.assertEqual(bits[0], True)
+        self.assertEqual(bits[-1], True)
+        self.assertEqual(bits[4:8], expected[4:8])
+        self.assertEqual(bits, expected)
+        self.assertEqual(int(bits), value)
+        self.assertEqual(bits_to_int(bits), value)
+
+    def test_bit_array_equality(self):
+        self.assertEqual(BitArray(b'\x03', 3), BitArray.from_int(3, 3))
+        self.assertNotEqual(BitArray(b'\x03', 3), BitArray(b'\x03', 4))
+        self.assertNotEqual(BitArray(b'\x03', 3), [True, False, True])
+
+    def test_bit_array_index_error(self):
+        bits = BitArray(b'\x01', 5)
+        with self.assertRaises(IndexError):
+            bits[5]
+        with self.assertRaises(IndexError):
+            bits[-6]
+
+    def test_join_bits(self):
+        joined = join_bits([BitArray.from_int(0b101, 3), BitArray.from_int(0b11, 2)])
+        self.assertEqual(len(joined), 5)
+        self.assertEqual(list(joined), [True, False, True, True, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from pylogix import PLC
+
+
+class PackServicesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.comm = PLC()
+        self.comm.ConnectionSize = 508
+        self.limit = 508 - 24
+
+    def tearDown(self):
+        self.comm.Close()
+
+    def assertPacked(self, sizes, packets, header_size):
+        # every service is placed exactly once
+        self.assertEqual(sorted(i for packet in packets for i in packet), list(range(len(sizes))))
+        for packet in packets:
+            if len(packet) == 1:
+                continue
+            request = header_size + 2 + sum(sizes[i][0] + 2 for i in packet)
+            reply = 6 + sum(sizes[i][1] + 2 for i in packet)
+            self.assertLessEqual(request, self.limit)
+            self.assertLessEqual(reply, self.limit)
+
+    def test_small_services_share_a_packet(self):
+        sizes = [(10, 10)] * 20
+        packets = self.comm._pack_services(sizes, 10)
+        self.assertEqual(packets, [list(range(20))])
+        self.assertEqual(self.comm.Packing.Packets, 1)
+
+    def test_limit_is_respected(self):
+        sizes = [(20, 6 + 4 * n) for n in range(1, 60)]
+        packets = self.comm._pack_services(sizes, 10)
+        self.assertPacked(sizes, packets, 10)
+        self.assertGreater(len(packets), 1)
+
+    def test_first_fit_decreasing(self):
+        # the two large replies can't share a packet, each is paired with a small one
+        sizes = [(100, 200), (100, 260), (100, 200), (100, 260)]
+        packets = self.comm._pack_services(sizes, 10)
+        self.assertEqual(len(packets), 2)
+        self.assertPacked(sizes, packets, 10)
+        for packet in packets:
+            self.assertEqual(sorted(max(sizes[i]) for i in packet), [200, 260])
+
+    def test_oversized_service_gets_its_own_packet(self):
+        sizes = [(10, 10), (10, 2000), (10, 10)]
+        packets = self.comm._pack_services(sizes, 10)
+        self.assertIn([1], packets)
+        self.assertIn([0, 2], packets)
+
+    def test_packets_keep_the_service_order(self):
+        sizes = [(10, 300), (10, 10), (10, 300), (10, 10)]
+        packets = self.comm._pack_services(sizes, 10)
+        for packet in packets:
+            self.assertEqual(packet, sorted(packet))
+        self.assertEqual(packets, sorted(packets))
+
+    def test_packing_report(self):
+        self.comm._pack_services([(10, 100), (10, 100)], 10)
+        report = self.comm.Packing
+        self.assertEqual(report.Limit, self.limit)
+        self.assertEqual(report.Packets, 1)
+        self.assertAlmostEqual(report.FillRatio, (6 + 2 * 102) / float(self.limit))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pylogix.lgx_record import LogReader, LogWriter, STRING_TYPE, column_for
+from pylogix.lgx_response import Response
+
+
+class KnownTagsPLC(object):
+    """
+    Only what column_for looks at
+    """
+
+    def __init__(self, known_tags):
+        self.KnownTags = known_tags
+
+
+def scan(*values):
+    return [Response('Tag', value, 0 if value is not None else 'Path destination unknown') for value in values]
+
+
+class ColumnForTests(unittest.TestCase):
+
+    def test_columns(self):
+        plc = KnownTagsPLC({'MyDint': (0xc4, 4), 'MyInt': (0xc3, 2), 'MyReal': (0xca, 4),
+                            'MyString': (0xa0, 88), 'Arr': (0xc4, 4)})
+        self.assertEqual(column_for(plc, Response('MyDint', 1, 0)), (0xc4, 4))
+        self.assertEqual(column_for(plc, Response('MyInt', 1, 0)), (0xc3, 2))
+        self.assertEqual(column_for(plc, Response('MyReal', 1.5, 0)), (0xca, 4))
+        self.assertEqual(column_for(plc, Response('Arr[3]', 1, 0)), (0xc4, 4))
+        self.assertEqual(column_for(plc, Response('MyDint.3', True, 0)), (0xc1, 1))
+        self.assertEqual(column_for(plc, Response('MyString', 'abc', 0)), (STRING_TYPE, 84))
+
+    def test_unknown_types(self):
+        plc = KnownTagsPLC({})
+        self.assertEqual(column_for(plc, Response('A', 1, 0)), (0xc5, 8))
+        self.assertEqual(column_for(plc, Response('A', 1.0, 0)), (0xcb, 8))
+        self.assertEqual(column_for(plc, Response('A', 'x', 0)), (STRING_TYPE, 82))
+        self.assertEqual(column_for(plc, Response('A', None, 5)), (0xcb, 8))
+
+    def test_not_a_single_value(self):
+        plc = KnownTagsPLC({'Arr': (0xc4, 4)})
+        self.assertIsNone(column_for(plc, Response('Arr', [1, 2], 0)))
+        self.assertIsNone(column_for(plc, Response('UDT', b'\x00' * 8, 0)))
+
+
+class LogTests(unittest.TestCase):
+
+    tags = ['MyDint', 'MyReal', 'MyBool', 'MyString', 'MyLint']
+    columns = [(0xc4, 4), (0xca, 4), (0xc1, 1), (STRING_TYPE, 8), (0xc5, 8)]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.start = time.mktime((2022, 4, 18, 15, 10, 0, 0, 0, -1))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def files(self):
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory))
+
+    def read_all(self):
+        records = []
+        for filename in self.files():
+            with LogReader(filename) as log:
+                self.assertEqual(log.Tags, self.tags)
+                self.assertEqual(log.Columns, self.columns)
+                records.extend(log)
+        return records
+
+    def test_round_trip(self):
+        with LogWriter(self.directory, self.tags, self.columns) as writer:
+            writer.write(self.start, scan(42, 1.5, True, 'hello', -(1 << 40)))
+            writer.write(self.start + 0.1, scan(-7, None, False, '', 0))
+            self.assertEqual(writer.RecordSize, 8 + 1 + 4 + 4 + 1 + 8 + 8)
+
+        self.assertEqual(self.read_all(), [
+            (self.start, [42, 1.5, True, 'hello', -(1 << 40)]),
+            (self.start + 0.1, [-7, None, False, '', 0])])
+
+    def test_long_strings_are_cut_to_the_column(self):
+        with LogWriter(self.directory, self.tags, self.columns) as writer:
+            writer.write(self.start, scan(1, 1.0, True, 'abcdefghijkl', 1))
+        self.assertEqual(self.read_all()[0][1][3], 'abcdefgh')
+
+    def test_values_that_dont_fit_their_column(self):
+        with LogWriter(self.directory, self.tags, self.columns) as writer:
+            # a float in a DINT column, a number in a string column, an
+            # out of range LINT
+            writer.write(self.start, scan(1.5, 2.0, True, 12, 1 << 70))
+        self.assertEqual(self.read_all(), [(self.start, [None, 2.0, True, None, None])])
+
+    def test_hourly_rotation(self):
+        with LogWriter(self.directory, self.tags, self.columns) as writer:
+            for minutes in (0, 30, 45, 55, 65):
+                writer.write(self.start + minutes * 60, scan(minutes, 0.0, False, '', 0))
+        files = self.files()
+        self.assertEqual([os.path.basename(f) for f in files],
+                         ['record_20220418_151000.plxlog', 'record_20220418_160500.plxlog'])
+        self.assertEqual([values[0] for _, values in self.read_all()], [0, 30, 45, 55, 65])
+
+    def test_size_rotation(self):
+        with LogWriter(self.directory, self.tags, self.columns, rotate_hourly=False, max_size=200) as writer:
+            header = len(writer.header)
+            for i in range(10):
+                writer.write(self.start + i, scan(i, 0.0, False, '', 0))
+            per_file = (200 - header) // writer.RecordSize
+        files = self.files()
+        self.assertEqual(len(files), -(-10 // per_file))
+        for filename in files:
+            self.assertLessEqual(os.path.getsize(filename), 200)
+        self.assertEqual([values[0] for _, values in self.read_all()], list(range(10)))
+
+    def test_truncated_record_is_ignored(self):
+        with LogWriter(self.directory, self.tags, self.columns) as writer:
+            writer.write(self.start, scan(1, 1.0, True, 'a', 1))
+            writer.write(self.start + 1, scan(2, 2.0, True, 'b', 2))
+        with open(self.files()[0], 'ab') as f:
+            f.write(b'\x01\x02\x03')
+        self.assertEqual([values[0] for _, values in self.read_all()], [1, 2])
+
+    def test_not_a_log_file(self):
+        filename = os.path.join(self.directory, 'tags.txt')
+        with open(filename, 'w') as f:
+            f.write('MyDint\nMyReal\n')
+        with self.assertRaises(ValueError):
+            LogReader(filename)
+
+    def test_truncated_header(self):
+        with LogWriter(self.directory, self.tags, self.columns) as writer:
+            writer.write(self.start, scan(42, 1.5, True, 'hello', 0))
+            header = writer.header
+        filename = self.files()[0]
+        # cut inside a column, then inside a column's name
+        for size in (20, len(header) - 3):
+            with open(filename, 'wb') as f:
+                f.write(header[:size])
+            with self.assertRaises(ValueError):
+                LogReader(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
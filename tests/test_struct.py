@@ -0,0 +1,137 @@
+import unittest
+
+from struct import pack
+
+from pylogix import PLC
+from pylogix.lgx_struct import StructDecoder, is_string_udt, member_layout, udt_size
+from pylogix.lgx_tag import Tag, UDT
+
+
+def make_field(name, type_word, info, offset):
+    """
+    A UDT member the way the template read builds it
+    """
+    field = Tag()
+    field.TagName = name
+    field.Bytes = pack('<HHI', info, type_word, offset)
+    field.SymbolType = type_word & 0xff
+    field.DataTypeValue = type_word & 0xfff
+    field.Array = (type_word & 0x6000) >> 13
+    field.Struct = (type_word & 0x8000) >> 15
+    field.Size = info if field.Array else 0
+    return field
+
+
+def make_udt(type_value, name, size, fields):
+    udt = UDT()
+    udt.Type = type_value
+    udt.Name = name
+    udt.Size = size
+    for field in fields:
+        udt.Fields.append(field)
+        udt.FieldsByName[field.TagName] = field
+    return udt
+
+
+STRING = make_udt(0xfce, 'STRING', 88, [
+    make_field('LEN', 0xc4, 0, 0),
+    make_field('DATA', 0x20c2, 82, 4)])
+
+MOTOR = make_udt(0x100, 'Motor', 16, [
+    make_field('Speed', 0xca, 0, 0),
+    make_field('Torque', 0xc4, 0, 4),
+    make_field('ZZZZZZZZZZMotor2', 0xc2, 0, 8),
+    make_field('Running', 0xc1, 0, 8),
+    make_field('Faulted', 0xc1, 1, 8),
+    make_field('Temps', 0x20c3, 3, 10)])
+
+LINE = make_udt(0x101, 'Line', 144, [
+    make_field('Name', 0x8fce, 0, 0),
+    make_field('Main', 0x8100, 0, 88),
+    make_field('Motors', 0xa100, 2, 104),
+    make_field('Alarms', 0x20d3, 2, 136)])
+
+UDTS = {0xfce: STRING, 0x100: MOTOR, 0x101: LINE}
+
+
+def motor_bytes(speed, torque, running, faulted, temps):
+    return pack('<fiB', speed, torque, running | faulted << 1) + b'\x00' + pack('<3h', *temps)
+
+
+def line_bytes(name, main, motors, alarms):
+    raw = name.encode('utf-8')
+    data = pack('<i', len(raw)) + raw + b'\x00' * (84 - len(raw))
+    return data + main + motors + alarms.to_bytes(8, 'little')
+
+
+class StructDecoderTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        comm = PLC()
+        cls.cip_types = comm.CIPTypes
+        comm.Close()
+
+    def test_layout_helpers(self):
+        self.assertTrue(is_string_udt(STRING))
+        self.assertFalse(is_string_udt(MOTOR))
+        self.assertEqual(member_layout(MOTOR.Fields[4]), (1, 8))
+        self.assertEqual(udt_size(MOTOR, self.cip_types), 16)
+
+    def test_size_without_template_size(self):
+        udt = make_udt(0x102, 'NoSize', 0, [
+            make_field('A', 0xc4, 0, 0),
+            make_field('B', 0xc2, 0, 4)])
+        self.assertEqual(udt_size(udt, self.cip_types), 8)
+
+    def test_decode_atomic_and_bool_members(self):
+        decoder = StructDecoder(MOTOR, UDTS, self.cip_types)
+        value = decoder.decode(motor_bytes(1.5, -20, 1, 0, (1, -2, 3)))
+        self.assertEqual(value, {'Speed': 1.5, 'Torque': -20, 'Running': True, 'Faulted': False,
+                                 'Temps': [1, -2, 3]})
+        self.assertEqual(decoder.Size, 16)
+        # the hidden SINT holding the BOOLs isn't a member
+        self.assertEqual(decoder.Names, ['Speed', 'Torque', 'Running', 'Faulted', 'Temps'])
+        self.assertEqual(sorted(decoder.Scalars), ['faulted', 'running', 'speed', 'torque'])
+
+    def test_decode_nested_strings_arrays_and_bits(self):
+        decoder = StructDecoder(LINE, UDTS, self.cip_types)
+        main = motor_bytes(7.0, 10, 0, 1, (4, 5, 6))
+        motors = motor_bytes(1.0, 1, 1, 1, (0, 0, 0)) + motor_bytes(2.0, 2, 0, 0, (9, 9, 9))
+        alarms = 1 << 0 | 1 << 33 | 1 << 63
+        value = decoder.decode(line_bytes('Line 1', main, motors, alarms))
+
+        self.assertEqual(value['Name'], 'Line 1')
+        self.assertEqual(value['Main']['Speed'], 7.0)
+        self.assertTrue(value['Main']['Faulted'])
+        self.assertEqual([m['Torque'] for m in value['Motors']], [1, 2])
+        self.assertEqual(value['Motors'][1]['Temps'], [9, 9, 9])
+        self.assertEqual(len(value['Alarms']), 64)
+        self.assertEqual([i for i, bit in enumerate(value['Alarms']) if bit], [0, 33, 63])
+
+    def test_decode_array_and_offset(self):
+        decoder = StructDecoder(MOTOR, UDTS, self.cip_types)
+        data = b'\xff' * 4 + motor_bytes(1.0, 1, 0, 0, (1, 1, 1)) + motor_bytes(2.0, 2, 1, 1, (2, 2, 2))
+        values = decoder.decode_array(data, 4, 2)
+        self.assertEqual([v['Speed'] for v in values], [1.0, 2.0])
+        self.assertEqual([v['Running'] for v in values], [False, True])
+
+    def test_record_format(self):
+        decoder = StructDecoder(MOTOR, UDTS, self.cip_types, record=True)
+        value = decoder.decode(motor_bytes(3.0, 4, 1, 0, (0, 1, 2)))
+        self.assertEqual(type(value).__name__, 'Motor')
+        self.assertEqual(value.Torque, 4)
+        self.assertEqual(value.Temps, [0, 1, 2])
+
+    def test_unknown_nested_type_is_kept_as_bytes(self):
+        udt = make_udt(0x103, 'Outer', 24, [
+            make_field('Head', 0xc4, 0, 0),
+            make_field('Inner', 0x8999, 0, 4),
+            make_field('Tail', 0xc4, 0, 20)])
+        decoder = StructDecoder(udt, UDTS, self.cip_types)
+        value = decoder.decode(pack('<i16si', 1, b'abcdefghijklmnop', 2))
+        self.assertEqual(value, {'Head': 1, 'Inner': b'abcdefghijklmnop', 'Tail': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
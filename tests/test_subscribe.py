@@ -0,0 +1,147 @@
+import asyncio
+import unittest
+
+from pylogix.lgx_async import AsyncSubscription
+from pylogix.lgx_response import Response
+from pylogix.lgx_subscribe import Subscription, parse_deadband
+
+
+class ScriptedPlan(object):
+    """
+    Stands in for a ReadPlan, each execute() returns the next scan
+    """
+
+    def __init__(self, tags, scans):
+        self.tags = tags
+        self.scans = list(scans)
+
+    def execute(self):
+        values = self.scans.pop(0)
+        return [Response(tag, value, status) for tag, (value, status) in zip(self.tags, values)]
+
+
+class ScriptedPLC(object):
+
+    def __init__(self, scans):
+        self.scans = scans
+
+    def CompileReadPlan(self, tags):
+        return ScriptedPlan(tags, self.scans)
+
+
+class AsyncScriptedPlan(ScriptedPlan):
+
+    async def execute(self):
+        return ScriptedPlan.execute(self)
+
+
+class AsyncScriptedPLC(ScriptedPLC):
+
+    def CompileReadPlan(self, tags):
+        return AsyncScriptedPlan(tags, self.scans)
+
+
+def ok(*values):
+    return [(value, 0) for value in values]
+
+
+def names(changes):
+    return [change.TagName for change in changes]
+
+
+class ParseDeadbandTests(unittest.TestCase):
+
+    def test_absolute(self):
+        self.assertEqual(parse_deadband(0.5), (0.5, False))
+        self.assertEqual(parse_deadband('2'), (2.0, False))
+
+    def test_percent(self):
+        self.assertEqual(parse_deadband('2%'), (2.0, True))
+        self.assertEqual(parse_deadband(' 0.5% '), (0.5, True))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_deadband('fast')
+
+
+class SubscriptionTests(unittest.TestCase):
+
+    def subscribe(self, tags, scans, **kwargs):
+        return Subscription(ScriptedPLC(scans), tags, **kwargs)
+
+    def test_first_poll_reports_everything(self):
+        sub = self.subscribe(['A', 'B'], [ok(1, 'x'), ok(1, 'x')])
+        self.assertEqual(names(sub.poll()), ['A', 'B'])
+        self.assertEqual(sub.poll(), [])
+        self.assertEqual((sub.Polls, sub.Changes), (2, 2))
+
+    def test_absolute_deadband(self):
+        sub = self.subscribe([('Speed', 0.5)], [ok(10.0), ok(10.4), ok(10.5), ok(10.6), ok(10.0)])
+        self.assertEqual([[c.Value for c in sub.poll()] for _ in range(5)], [[10.0], [], [], [10.6], [10.0]])
+
+    def test_percent_deadband_of_last_reported_value(self):
+        # 10% of 100, then of 111
+        sub = self.subscribe([('Level', '10%')], [ok(100), ok(109), ok(111), ok(121), ok(123)])
+        self.assertEqual([[c.Value for c in sub.poll()] for _ in range(5)], [[100], [], [111], [], [123]])
+
+    def test_default_deadband(self):
+        sub = self.subscribe(['A', ('B', 0)], [ok(1.0, 1.0), ok(1.5, 1.5)], deadband=1)
+        sub.poll()
+        self.assertEqual(names(sub.poll()), ['B'])
+
+    def test_no_deadband_reports_any_change(self):
+        sub = self.subscribe(['A'], [ok(5), ok(5), ok(6)])
+        self.assertEqual([names(sub.poll()) for _ in range(3)], [['A'], [], ['A']])
+
+    def test_non_numbers_compare_equal(self):
+        sub = self.subscribe(['S', 'L', 'B'], [ok('a', [1, 2], True), ok('a', [1, 2], True),
+                                               ok('b', [1, 3], False)])
+        self.assertEqual([names(sub.poll()) for _ in range(3)], [['S', 'L', 'B'], [], ['S', 'L', 'B']])
+
+    def test_bool_ignores_deadband(self):
+        sub = self.subscribe([('B', 5)], [ok(False), ok(True)])
+        sub.poll()
+        self.assertEqual(names(sub.poll()), ['B'])
+
+    def test_status_changes_are_reported(self):
+        scans = [ok(1), [(None, 5)], [(None, 5)], ok(1), ok(1)]
+        sub = self.subscribe([('A', 10)], scans)
+        self.assertEqual([names(sub.poll()) for _ in range(5)], [['A'], ['A'], [], ['A'], []])
+
+    def test_type_change_is_reported(self):
+        sub = self.subscribe([('A', 10)], [ok('x'), ok(1), ok(2)])
+        self.assertEqual([names(sub.poll()) for _ in range(3)], [['A'], ['A'], []])
+
+    def test_large_integers_compare_exactly(self):
+        big = 1 << 60
+        sub = self.subscribe(['A'], [ok(big), ok(big + 1), ok(big + 1)])
+        self.assertEqual([names(sub.poll()) for _ in range(3)], [['A'], ['A'], []])
+
+    def test_callback_and_generator(self):
+        got = []
+        sub = self.subscribe(['A'], [ok(1), ok(1), ok(2)], period=0.001, callback=got.append)
+        changes = sub.changes()
+        self.assertEqual(next(changes).Value, 1)
+        self.assertEqual(next(changes).Value, 2)
+        self.assertEqual([c.Value for c in got], [1, 2])
+        self.assertEqual(sub.Polls, 3)
+        self.assertIsNotNone(sub.Timestamp)
+
+
+class AsyncSubscriptionTests(unittest.TestCase):
+
+    def test_poll_and_changes(self):
+        async def scan():
+            sub = AsyncSubscription(AsyncScriptedPLC([ok(1), ok(1), ok(3), ok(4)]), [('A', 1)], period=0.001)
+            first = names(await sub.poll())
+            second = names(await sub.poll())
+            changes = sub.changes()
+            change = await changes.__anext__()
+            await changes.aclose()
+            return first, second, change.Value
+
+        self.assertEqual(asyncio.run(scan()), (['A'], [], 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
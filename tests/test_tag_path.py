@@ -0,0 +1,63 @@
+import unittest
+
+from pylogix.eip import bit_of_word, parse_tag_name, parse_tag_path
+
+
+class TagPathTests(unittest.TestCase):
+
+    def test_plain_tag(self):
+        path = parse_tag_path('MyDint')
+        self.assertEqual(path.Segments, [('MyDint', None)])
+        self.assertIsNone(path.Bit)
+        self.assertEqual(path.BaseTag, 'MyDint')
+        self.assertEqual(path.Index, 0)
+        self.assertFalse(path.Indexed)
+
+    def test_array_element(self):
+        path = parse_tag_path('Arr[10]')
+        self.assertEqual(path.Segments, [('Arr', 10)])
+        self.assertEqual(path.BaseTag, 'Arr')
+        self.assertEqual(path.Index, 10)
+        self.assertTrue(path.Indexed)
+
+    def test_multi_dim_index(self):
+        path = parse_tag_path('Grid[1, 2,3]')
+        self.assertEqual(path.Segments, [('Grid', [1, 2, 3])])
+        self.assertEqual(path.Index, [1, 2, 3])
+
+    def test_program_member_and_bit(self):
+        path = parse_tag_path('Program:Main.MyUDT[2,3].Status.5')
+        self.assertEqual(path.Segments, [('Program:Main', None), ('MyUDT', [2, 3]), ('Status', None)])
+        self.assertEqual(path.Bit, 5)
+        self.assertEqual(path.BaseTag, 'Program:Main.MyUDT[2,3].Status')
+        self.assertFalse(path.Indexed)
+
+    def test_inner_indexes_stay_in_base_tag(self):
+        path = parse_tag_path('A.B[1].C[2]')
+        self.assertEqual(path.Segments, [('A', None), ('B', 1), ('C', 2)])
+        self.assertEqual(path.BaseTag, 'A.B[1].C')
+        self.assertEqual(path.Index, 2)
+
+    def test_invalid_index_is_kept_in_the_name(self):
+        for tag in ('Bad[x]', 'Bad[01]', 'Bad[]'):
+            path = parse_tag_path(tag)
+            self.assertEqual(path.Segments, [(tag, 0)])
+            self.assertEqual(path.BaseTag, tag)
+            self.assertFalse(path.Indexed)
+
+    def test_paths_are_cached(self):
+        self.assertIs(parse_tag_path('Cached.Tag[3]'), parse_tag_path('Cached.Tag[3]'))
+
+    def test_parse_tag_name(self):
+        self.assertEqual(parse_tag_name('MyTag.Name[42]'), ('MyTag.Name[42]', 'MyTag.Name', 42))
+        self.assertEqual(parse_tag_name('MyDint.3'), ('MyDint.3', 'MyDint', 0))
+
+    def test_bit_of_word(self):
+        self.assertTrue(bit_of_word('MyDint.31'))
+        self.assertTrue(bit_of_word('Arr[2].0'))
+        self.assertFalse(bit_of_word('MyDint'))
+        self.assertFalse(bit_of_word('MyUDT.Member'))
+
+
+if __name__ == '__main__':
+    unittest.main()